@@ -1,9 +1,14 @@
 import React, { useEffect, useState } from 'react';
 import './App.css';
 
+const API_URL = 'http://localhost:5001';
+const TRIP_FIELDS = 'Trip_ID,Vehicle_Type,Total_Distance,Trip_Time,Capacity_Utilization,Time_Utilization,Shipments,Route';
+const PAGE_SIZE = 100;
+
 const OptimizedRoutes = () => {
   const [trips, setTrips] = useState([]);
-  const [filteredTrips, setFilteredTrips] = useState([]);
+  const [runId, setRunId] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [prediction, setPrediction] = useState(null);
   const [error, setError] = useState(null);
 
@@ -17,38 +22,81 @@ const OptimizedRoutes = () => {
     fetchOptimizedRoutes();
   }, []);
 
+  // Render trips as the server finishes each partition instead of waiting for the full solve
   const fetchOptimizedRoutes = async () => {
     try {
-      const response = await fetch('http://localhost:5001/api/optimize-routes', {
+      // Reuse the last run when the server says it is unchanged
+      const cached = JSON.parse(localStorage.getItem('optimizedRoutes') || 'null');
+      const headers = { 'Content-Type': 'application/json' };
+      if (cached?.etag) headers['If-None-Match'] = cached.etag;
+
+      const response = await fetch(`${API_URL}/api/optimize-routes/stream?fields=${TRIP_FIELDS}`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers,
         body: JSON.stringify({}),
       });
-
-      const data = await response.json();
-      if (response.ok) {
-        setTrips(data.trips);
-        setFilteredTrips(data.trips); // Initialize with all trips
-      } else {
+      if (response.status === 304 && cached) {
+        setTrips(cached.trips);
+        setRunId(cached.runId);
+        return;
+      }
+      if (!response.ok) {
         console.error('Failed to fetch optimized routes');
+        return;
+      }
+
+      setTrips([]);
+      const etag = response.headers.get('ETag');
+      const received = [];
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        const batch = [];
+        for (const line of lines.filter(Boolean)) {
+          const message = JSON.parse(line);
+          if (message.type === 'trip') batch.push(message);
+          else if (message.type === 'done') {
+            setRunId(message.run_id);
+            // Only a complete run is kept for the next conditional request
+            if (etag) {
+              localStorage.setItem('optimizedRoutes',
+                JSON.stringify({ etag, runId: message.run_id, trips: [...received, ...batch] }));
+            }
+          } else if (message.type === 'error') console.error('Optimization failed:', message.error);
+        }
+        if (batch.length) {
+          received.push(...batch);
+          setTrips(previous => [...previous, ...batch]);
+        }
       }
     } catch (error) {
       console.error('Error fetching optimized routes:', error);
     }
   };
 
+  // Filtering and paging happen on the server against the stored run; pages carry
+  // the run's ETag, so the browser cache revalidates them with If-None-Match
+  const fetchTripPage = async (type, cursor) => {
+    const params = new URLSearchParams({ fields: TRIP_FIELDS, limit: PAGE_SIZE });
+    if (type.trim()) params.set('vehicle_type', type.trim());
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`${API_URL}/api/runs/${runId}/trips?${params}`);
+    const data = await response.json();
+    if (!response.ok) throw new Error(data.error || 'Failed to load trips');
+    setTrips(previous => (cursor ? [...previous, ...data.trips] : data.trips));
+    setNextCursor(data.next_cursor);
+  };
+
   const handleFilterChange = (type, value) => {
     if (type === 'vehicleType') setVehicleType(value);
-
-    const filtered = trips.filter(trip => {
-      const matchVehicleType = vehicleType
-        ? trip['Vehicle_Type']?.trim().toLowerCase().includes(vehicleType.trim().toLowerCase())
-        : true;
-
-      return matchVehicleType;
-    });
-
-    setFilteredTrips(filtered);
+    if (runId) fetchTripPage(value, null).catch(err => console.error(err));
   };
 
   const generateGoogleMapsLink = (startLat, startLon, endLat, endLon) => {
@@ -64,7 +112,7 @@ const OptimizedRoutes = () => {
         longitude: parseFloat(longitude),
         time_slot
       })
-      const response = await fetch('http://localhost:5001/api/predict-vehicle', {
+      const response = await fetch(`${API_URL}/api/predict-vehicle`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: body
@@ -79,13 +127,8 @@ const OptimizedRoutes = () => {
     }
   };
 
-  // Function to calculate the number of shipments
-  const getNumberOfShipments = (shipments) => {
-    if (shipments) {
-      return Array.isArray(shipments) ? shipments.length : shipments.split(',').length;
-    }
-    return 0;
-  };
+  const getTimeSlots = (route) => [...new Set(route.map(stop => stop['TIME_SLOT']))].join(', ');
+  const formatPercent = (value) => `${Math.round(value * 100)}%`;
 
   return (
     <div className="optimized-routes-container">
@@ -167,28 +210,36 @@ const OptimizedRoutes = () => {
           </tr>
         </thead>
         <tbody>
-          {filteredTrips.map((trip) => (
-            <tr key={trip['TRIP_ID']}>
-              <td>{trip['TRIP_ID']}</td>
-              <td>{trip['Shipments']}</td>
-              <td>{getNumberOfShipments(trip['Shipments'])}</td> {/* Display the number of shipments */}
-              <td>{trip['TIME_SLOT']}</td>
-              <td>{trip['TRIP_TIME']}</td>
-              <td>{'19.075887,72.877911'}</td>
-              <td>{`${trip['Latitude']},${trip['Longitude']}`}</td>
-              <td>{trip['Vehicle_Type']}</td>
-              <td>{trip['MST_DIST']}</td>
-              <td>{trip['CAPACITY_UTI']}</td>
-              <td>{trip['TIME_UTI']}</td>
-              <td>
-                <a href={generateGoogleMapsLink('19.075887', '72.877911', trip['Latitude'], trip['Longitude'])} target="_blank" rel="noopener noreferrer">
-                  View Map
-                </a>
-              </td>
-            </tr>
-          ))}
+          {trips.map((trip) => {
+            const lastStop = trip['Route'][trip['Route'].length - 1] || {};
+            return (
+              <tr key={trip['Trip_ID']}>
+                <td>{trip['Trip_ID']}</td>
+                <td>{trip['Shipments'].join(', ')}</td>
+                <td>{trip['Shipments'].length}</td>
+                <td>{getTimeSlots(trip['Route'])}</td>
+                <td>{trip['Trip_Time']}</td>
+                <td>{'19.075887,72.877911'}</td>
+                <td>{`${lastStop['Latitude']},${lastStop['Longitude']}`}</td>
+                <td>{trip['Vehicle_Type']}</td>
+                <td>{trip['Total_Distance']}</td>
+                <td>{formatPercent(trip['Capacity_Utilization'])}</td>
+                <td>{formatPercent(trip['Time_Utilization'])}</td>
+                <td>
+                  <a href={generateGoogleMapsLink('19.075887', '72.877911', lastStop['Latitude'], lastStop['Longitude'])} target="_blank" rel="noopener noreferrer">
+                    View Map
+                  </a>
+                </td>
+              </tr>
+            );
+          })}
         </tbody>
       </table>
+      {nextCursor && (
+        <button onClick={() => fetchTripPage(vehicleType, nextCursor).catch(err => console.error(err))}>
+          Load more
+        </button>
+      )}
 
       {/* Map */}
       <h2>Optimized Routes Map</h2>
@@ -1,11 +1,18 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from scipy.spatial.distance import pdist, squareform
-from scipy.sparse.csgraph import minimum_spanning_tree
-import folium
 import logging
-from data import Read_Output_data, read_Shipment_data, read_Store_Location, read_Vehical_Information, write_output_data
+import time
+from geo import haversine, haversine_one_to_many
+from partition import capacity_partition
+from routing import build_route
+from savings import savings_routes
+from parallel import iter_partitions, solve_partitions
+from trip_result import TripResult
+from fleet import PRIORITY_VEHICLE_TYPES, assign_by_regret, unbounded_numeric, vehicle_feasibility
+from timeslots import IntervalIndex, parse_timeslot, parse_timeslots, slots_overlap
+from metrics import CLUSTERS, DROPPED_CLUSTERS, DROPPED_SHIPMENTS, STAGE_ROWS, timed
+from data import (iter_shipment_chunks, load_workbook, records_to_frame,
+                  INPUT_FILE, SHIPMENTS_SHEET, STORE_SHEET, VEHICLES_SHEET, SHIPMENT_ALIASES, STORE_ALIASES, VEHICLE_ALIASES)
 
 class SmartRouteOptimizer:
     def __init__(self, logging_level=logging.INFO):
@@ -18,6 +25,10 @@ class SmartRouteOptimizer:
         self.TRAVEL_TIME_PER_KM = 5  # mins
         self.CAPACITY_UTILIZATION_THRESHOLD = 0.5
         self.TRIP_TIME_LIMIT = 120
+        self.ROUTE_TIME_BUDGET = 0.05  # secs of local search per trip
+        self.MAX_TRIPS_PER_VEHICLE = 1  # trips each vehicle in the fleet 'Number' can run
+        self.N_CLUSTERS = None  # KMeans clusters; None = one per 5 shipments
+        self.distance_provider = None  # road distances for routing; haversine when None
         
         # Initialize placeholders
         self.shipments = None
@@ -26,25 +37,26 @@ class SmartRouteOptimizer:
         self.processed_shipments = None
         self.priority_vehicles = None
         self.trips_df = None
+        self.result = None
+        self.cluster_summary = None
+        self._window_index = None
+        self._window_ids = None
+        self._window_trees = None
+        self._trip_rows = None
+        self._shipment_coords = None
+        self._route_cache = None  # optional {key: (stop order, km)} shared across runs, e.g. by sweeps
 
-    def load_data(self):
+    @timed('load')
+    def load_data(self, path=INPUT_FILE):
         try:
-            self.shipments = read_Shipment_data().dropna()
-            self.vehicles = read_Vehical_Information().dropna()
-            self.store = read_Store_Location().dropna().iloc[0]
-            
-            # Clean vehicle data: convert numeric columns
-            self.vehicles.columns = [col.lower().replace(' ', '_') for col in self.vehicles.columns]
-            numeric_cols = ['max_trip_radius_(in_km)', 'shipments_capacity']
-            for col in numeric_cols:
-                self.vehicles[col] = pd.to_numeric(self.vehicles[col], errors='coerce')
-            
-            # Drop vehicles with invalid numeric data
-            self.vehicles = self.vehicles.dropna(subset=numeric_cols)
-            
+            # One parse (or snapshot mmap) for all three sheets
+            workbook = load_workbook(path)
+            self.shipments = workbook[SHIPMENTS_SHEET].dropna()
+            self._load_fleet(workbook)
+
             assert not self.shipments.empty, "No shipment data available"
-            assert not self.vehicles.empty, "No vehicle data available"
-            
+
+            STAGE_ROWS.inc(len(self.shipments), stage='load')
             self.logger.info(f"Loaded {len(self.shipments)} shipments and {len(self.vehicles)} vehicle types")
             return self
         
@@ -52,32 +64,64 @@ class SmartRouteOptimizer:
             self.logger.error(f"Data loading error: {e}")
             raise
 
+    @timed('load')
+    def load_records(self, shipments, vehicles=None, store=None):
+        """Load shipments (and optionally vehicles and store) from in-memory records.
+
+        Each argument may be anything data.records_to_frame accepts (JSON
+        records, column arrays, NumPy or Arrow data). Vehicles and store
+        fall back to the workbook only when not supplied.
+        """
+        try:
+            self.shipments = records_to_frame(shipments, SHIPMENT_ALIASES).dropna()
+            if vehicles is None or store is None:
+                workbook = load_workbook()
+                vehicles = workbook[VEHICLES_SHEET] if vehicles is None else vehicles
+                store = workbook[STORE_SHEET] if store is None else store
+            self._prepare_fleet(records_to_frame(vehicles, VEHICLE_ALIASES), records_to_frame(store, STORE_ALIASES))
+
+            assert not self.shipments.empty, "No shipment data available"
+
+            STAGE_ROWS.inc(len(self.shipments), stage='load')
+            self.logger.info(f"Loaded {len(self.shipments)} shipments and {len(self.vehicles)} vehicle types from records")
+            return self
+
+        except Exception as e:
+            self.logger.error(f"Data loading error: {e}")
+            raise
+
+    def _load_fleet(self, workbook):
+        self._prepare_fleet(workbook[VEHICLES_SHEET], workbook[STORE_SHEET])
+
+    def _prepare_fleet(self, vehicles, store):
+        self.vehicles = vehicles.dropna()
+        self.store = store.dropna().iloc[0]
+
+        # Clean vehicle data: convert numeric columns ("Any" radius/count is unbounded)
+        self.vehicles.columns = [col.lower().replace(' ', '_') for col in self.vehicles.columns]
+        numeric_cols = ['max_trip_radius_(in_km)', 'shipments_capacity']
+        self.vehicles['shipments_capacity'] = pd.to_numeric(self.vehicles['shipments_capacity'], errors='coerce')
+        self.vehicles['max_trip_radius_(in_km)'] = unbounded_numeric(self.vehicles['max_trip_radius_(in_km)'])
+        self.vehicles['number'] = unbounded_numeric(self.vehicles['number']) if 'number' in self.vehicles else np.inf
+
+        # Drop vehicles with invalid numeric data
+        self.vehicles = self.vehicles.dropna(subset=numeric_cols)
+        assert not self.vehicles.empty, "No vehicle data available"
+
+        self.priority_vehicles = self.vehicles[
+            self.vehicles['vehicle_type'].isin(PRIORITY_VEHICLE_TYPES)
+        ].sort_values('shipments_capacity', ascending=False)
+
+    @timed('preprocess')
     def preprocess_data(self):
         try:
-            shipment_info = []
-            for _, row in self.shipments.iterrows():
-                distance = self._calculate_haversine_distance(
-                    self.store['Latitute'], self.store['Longitude'], 
-                    row['Latitude'], row['Longitude']
-                )
-                
-                shipment_info.append({
-                    'Shipment ID': row['Shipment ID'],
-                    'Distance': distance,
-                    'Time Slot Start': int(row['Delivery Timeslot'].split('-')[0].split(':')[0]),
-                    'Time Slot End': int(row['Delivery Timeslot'].split('-')[1].split(':')[0])
-                })
-            
             self.processed_shipments = pd.merge(
-                self.shipments, 
-                pd.DataFrame(shipment_info), 
+                self.shipments,
+                self._shipment_features(self.shipments),
                 on='Shipment ID'
             )
             
-            self.priority_vehicles = self.vehicles[
-                self.vehicles['vehicle_type'].isin(['3W', '4W-EV'])
-            ].sort_values('shipments_capacity', ascending=False)
-            
+            STAGE_ROWS.inc(len(self.processed_shipments), stage='preprocess')
             self.logger.info(f"Preprocessed {len(self.processed_shipments)} shipments")
             return self
         
@@ -85,158 +129,457 @@ class SmartRouteOptimizer:
             self.logger.error(f"Data preprocessing error: {e}")
             raise
 
+    def _shipment_features(self, shipments):
+        """Store distance and parsed time slot for a frame of raw shipments."""
+        distance = haversine_one_to_many(
+            self.store['Latitute'], self.store['Longitude'],
+            shipments['Latitude'].to_numpy(), shipments['Longitude'].to_numpy()
+        )
+        slot_start, slot_end = parse_timeslots(shipments['Delivery Timeslot'])
+
+        return pd.DataFrame({
+            'Shipment ID': shipments['Shipment ID'].to_numpy(),
+            'Distance': distance,
+            'Time Slot Start': slot_start,
+            'Time Slot End': slot_end
+        })
+
     def _calculate_haversine_distance(self, lat1, lon1, lat2, lon2):
-        R = 6371
-        lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
-        return R * 2 * np.arcsin(np.sqrt(a))
-
-    def _calculate_mst_distance(self, cluster_data):
-        try:
-            if len(cluster_data) < 2:
-                return 0
+        return haversine(lat1, lon1, lat2, lon2)
+
+    @timed('optimize')
+    def optimize_trips(self, method='kmeans', engine='cluster', partition_by=None, region_level=0, workers=None):
+        """Build trips with the selected engine.
+
+        ``engine='cluster'`` clusters shipments and assigns a vehicle per
+        cluster: ``method='kmeans'`` keeps the original KMeans(n // 5)
+        clustering, ``method='grid'`` uses the O(n log n) capacity-aware
+        partitioner so every cluster is compact and fits every priority vehicle.
+        ``engine='savings'`` runs the Clarke-Wright savings CVRP solver.
+
+        ``partition_by='timeslot'`` solves each delivery timeslot (further
+        split into 4**region_level spatial tiles) independently across
+        ``workers`` processes and merges the trips deterministically.
 
-            coords = cluster_data[['Latitude', 'Longitude']].values
-            dist_matrix = squareform(pdist(coords, metric='euclidean'))
-            mst = minimum_spanning_tree(dist_matrix)
-            return round(mst.toarray().sum(), 2)
+        Returns a TripResult; ``to_legacy()`` gives the original flat rows.
+        """
+        try:
+            if partition_by is None:
+                trips = self._solve(method, engine)
+            elif partition_by == 'timeslot':
+                trips = solve_partitions(self, method, engine, region_level=region_level, workers=workers)
+            else:
+                raise ValueError(f"Unknown partitioning: {partition_by}")
+            return self._finalize_trips(trips)
 
         except Exception as e:
-            self.logger.error(f"Error calculating MST distance: {e}")
-            return 0
+            self.logger.error(f"Trip optimization error: {e}")
+            raise
 
-    def optimize_trips(self):
+    def iter_trips(self, method='kmeans', engine='cluster', region_level=0, workers=None):
+        """Solve timeslot/region partitions, yielding each one's TripResult as soon as it is done.
+
+        The trips are those of ``optimize_trips(partition_by='timeslot')``;
+        once the generator is exhausted, trips_df, the cluster index and
+        ``result`` hold the complete run.
+        """
         try:
+            trips = []
+            for part_trips in iter_partitions(self, method, engine, region_level=region_level, workers=workers):
+                self._set_coverage(part_trips)
+                trips.extend(part_trips)
+                yield TripResult.from_trips(pd.DataFrame(part_trips), self.processed_shipments)
+            self._finalize_trips(trips)
+
+        except Exception as e:
+            self.logger.error(f"Trip optimization error: {e}")
+            raise
+
+    def _solve(self, method='kmeans', engine='cluster'):
+        """Label clusters on processed_shipments and return the raw trip records."""
+        if engine == 'savings':
+            return self._solve_savings()
+        if engine != 'cluster':
+            raise ValueError(f"Unknown optimization engine: {engine}")
+
+        self._label_clusters(method)
+        return self._build_trips()
+
+    @timed('cluster')
+    def _label_clusters(self, method='kmeans'):
+        """Write a 'Cluster' label per processed shipment."""
+        if method == 'kmeans':
+            from sklearn.cluster import KMeans
+
             X = self.processed_shipments[['Latitude', 'Longitude']].values
-            n_clusters = max(1, len(X) // 5)
+            n_clusters = min(len(X), self.N_CLUSTERS or max(1, len(X) // 5))
             kmeans = KMeans(n_clusters=n_clusters, random_state=42)
             self.processed_shipments['Cluster'] = kmeans.fit_predict(X)
-            
-            trips = []
-            for cluster_id in self.processed_shipments['Cluster'].unique():
-                cluster_data = self.processed_shipments[
-                    self.processed_shipments['Cluster'] == cluster_id
-                ]
-                
-                trip = self._assign_vehicle_to_cluster(cluster_data)
-                if trip:
-                    total_shipments = len(self.processed_shipments)
-                    assigned_shipments = len(trip['Shipments'])
-                    cov_uti = f"{(assigned_shipments / total_shipments) * 100:.2f}%" if total_shipments > 0 else "0%"
-                    trip["COV_UTI"] = cov_uti
-                    trip["Cluster"] = cluster_id  # Store cluster reference
-                    trips.append(trip)
-        
-            self.trips_df = pd.DataFrame(trips)
-            shipment_rows = []
-            for _, trip in self.trips_df.iterrows():
-                cluster_data = self.processed_shipments[
-                    self.processed_shipments['Shipment ID'].isin(trip['Shipments'])
-                ]
-                for _, shipment in cluster_data.iterrows():
-                    shipment_rows.append({
-                        'TRIP_ID': trip['Trip_ID'],
-                        'Shipment_ID': shipment['Shipment ID'],
-                        'Latitude': shipment['Latitude'],
-                        'Longitude': shipment['Longitude'],
-                        'TIME_SLOT': f"{shipment['Time Slot Start']} - {shipment['Time Slot End']}",
-                        'Shipments': ', '.join(map(str, trip['Shipments'])),
-                        'MST_DIST': trip['Total_Distance'],
-                        'TRIP_TIME': round(trip['Total_Distance'] * self.TRAVEL_TIME_PER_KM, 2),
-                        'Vehicle_Type': trip['Vehicle_Type'],
-                        'CAPACITY_UTI': trip['Capacity_Utilization'],
-                        'TIME_UTI': trip['Time_Utilization'],
-                        'COV_UTI': trip['COV_UTI']  
-                    })
-            
-            return pd.DataFrame(shipment_rows)
-        
+        elif method == 'grid':
+            # Groups sized for the smallest priority vehicle fit every priority vehicle,
+            # so the fleet counts rather than group sizes decide how many get a trip
+            fleet = self.priority_vehicles if not self.priority_vehicles.empty else self.vehicles
+            self.processed_shipments['Cluster'] = capacity_partition(
+                self.processed_shipments['Latitude'].to_numpy(),
+                self.processed_shipments['Longitude'].to_numpy(),
+                capacity=int(fleet['shipments_capacity'].min())
+            )
+        else:
+            raise ValueError(f"Unknown clustering method: {method}")
+        CLUSTERS.inc(int(self.processed_shipments['Cluster'].nunique()))
+
+    def compare_engines(self, engines=('cluster', 'savings'), method='kmeans'):
+        """Run each engine on the same preprocessed data and report vehicles, km and wall time."""
+        rows = []
+        for engine in engines:
+            candidate = self._clone()
+            start = time.perf_counter()
+            candidate.optimize_trips(method=method, engine=engine)
+            wall_time = time.perf_counter() - start
+
+            trips = candidate.trips_df
+            assigned = int(trips['Shipments'].str.len().sum()) if not trips.empty else 0
+            rows.append({
+                'engine': engine,
+                'vehicles': len(trips),
+                'total_km': round(float(trips['Total_Distance'].sum()), 2) if not trips.empty else 0.0,
+                'shipments_assigned': assigned,
+                'shipments_dropped': len(candidate.processed_shipments) - assigned,
+                'wall_time_s': round(wall_time, 3)
+            })
+        return pd.DataFrame(rows)
+
+    def sweep_parameters(self, grid, method='kmeans', engine='cluster', workers=None):
+        """Run every parameter set in ``grid`` on this optimizer's preprocessed data.
+
+        See sweep.run_sweep; returns one comparison row per parameter set.
+        """
+        from sweep import run_sweep
+
+        return run_sweep(self, grid, method=method, engine=engine, workers=workers)
+
+    def _clone(self):
+        """Fresh optimizer sharing this one's loaded data and constants."""
+        clone = SmartRouteOptimizer.__new__(SmartRouteOptimizer)
+        clone.__dict__.update(self.__dict__)
+        clone.processed_shipments = self.processed_shipments.copy()
+        clone.trips_df = None
+        clone.result = None
+        clone.cluster_summary = None
+        clone._window_index = None
+        clone._window_ids = None
+        clone._window_trees = None
+        clone._trip_rows = None
+        clone._shipment_coords = None
+        return clone
+
+    @timed('savings')
+    def _solve_savings(self):
+        """Clarke-Wright savings engine; each route becomes one trip (and one cluster)."""
+        shipments = self.processed_shipments
+        fleet = self.priority_vehicles if not self.priority_vehicles.empty else self.vehicles
+        vehicles = list(zip(fleet['shipments_capacity'].astype(float), fleet['max_trip_radius_(in_km)'].astype(float)))
+
+        routes = savings_routes(
+            self.store['Latitute'], self.store['Longitude'],
+            shipments['Latitude'].to_numpy(), shipments['Longitude'].to_numpy(),
+            shipments['Time Slot Start'].to_numpy(), shipments['Time Slot End'].to_numpy(),
+            vehicles=vehicles,
+            trip_time_limit=self.TRIP_TIME_LIMIT,
+            travel_time_per_km=self.TRAVEL_TIME_PER_KM,
+            delivery_time_per_shipment=self.DELIVERY_TIME_PER_SHIPMENT,
+            provider=self.distance_provider
+        )
+
+        # Smallest vehicle that can carry the route gets it, within the fleet counts
+        fleet = fleet.sort_values('shipments_capacity')
+        cluster_labels = np.empty(len(shipments), dtype=np.int64)
+        sizes = np.empty(len(routes))
+        farthest = np.empty(len(routes))
+        distances = shipments['Distance'].to_numpy()
+        for route_id, (stops, _) in enumerate(routes):
+            cluster_labels[stops] = route_id
+            sizes[route_id] = len(stops)
+            farthest[route_id] = distances[stops].max()
+        _, cost = vehicle_feasibility(
+            sizes, farthest, np.zeros(len(routes)),
+            capacities=fleet['shipments_capacity'].to_numpy(dtype=float),
+            radii=fleet['max_trip_radius_(in_km)'].to_numpy(dtype=float),
+            priority=np.ones(len(fleet), dtype=bool),
+            utilization_threshold=0.0, trip_time_limit=np.inf
+        )
+        assignment = assign_by_regret(cost, fleet['number'].to_numpy(dtype=float) * self.MAX_TRIPS_PER_VEHICLE)
+
+        trips = []
+        for route_id, ((stops, tour_km), vehicle_index) in enumerate(zip(routes, assignment)):
+            if vehicle_index < 0:
+                continue
+
+            vehicle = fleet.iloc[vehicle_index]
+            route_data = shipments.iloc[stops]
+            available_time = route_data['Time Slot End'].max() - route_data['Time Slot Start'].min()
+            trip_minutes = self._trip_minutes(tour_km, len(stops))
+            trips.append({
+                'Trip_ID': f"Trip_{route_id}",
+                'Shipments': route_data['Shipment ID'].tolist(),
+                'Vehicle_Type': vehicle['vehicle_type'],
+                'Total_Distance': round(tour_km, 2),
+                'Trip_Time': round(trip_minutes, 2),
+                'Capacity_Utilization': len(stops) / float(vehicle['shipments_capacity']),
+                'Time_Utilization': trip_minutes / available_time if available_time > 0 else 0.0,
+                'Cluster': route_id
+            })
+
+        self.processed_shipments['Cluster'] = cluster_labels
+        self.logger.info(f"Savings engine built {len(routes)} routes, {len(trips)} with a feasible vehicle")
+        return trips
+
+    def iter_trips_streaming(self, path, chunksize=50_000, n_regions=256):
+        """Optimize a large CSV/Parquet shipment file chunk by chunk, yielding each chunk's TripResult.
+
+        Every chunk is clustered, routed and assigned from the fleet counts
+        the earlier chunks left over, then dropped before the next chunk is
+        read, so memory is bounded by ``chunksize`` rather than the file.
+        Trips never span chunks and Coverage is relative to the chunk;
+        processed_shipments holds only the chunk being solved. Vehicles and
+        the store come from the workbook.
+        """
+        try:
+            if self.vehicles is None or self.store is None:
+                self._load_fleet(load_workbook())
+
+            trips_left = self.vehicles['number'].to_numpy(dtype=float) * self.MAX_TRIPS_PER_VEHICLE
+            next_cluster = 0
+            for chunk in iter_shipment_chunks(path, chunksize=chunksize):
+                chunk = chunk.dropna(subset=['Shipment ID', 'Latitude', 'Longitude', 'Delivery Timeslot'])
+                if chunk.empty:
+                    continue
+                trips = self._solve_chunk(chunk, n_regions, next_cluster, trips_left)
+                next_cluster = int(self.processed_shipments['Cluster'].max()) + 1
+                used = pd.Series([trip['Vehicle_Type'] for trip in trips], dtype=object).value_counts()
+                trips_left = trips_left - used.reindex(self.vehicles['vehicle_type'], fill_value=0).to_numpy()
+                self._set_coverage(trips)
+                yield TripResult.from_trips(pd.DataFrame(trips), self.processed_shipments)
+                del chunk, trips
+
         except Exception as e:
-            self.logger.error(f"Trip optimization error: {e}")
+            self.logger.error(f"Streaming trip optimization error: {e}")
             raise
 
-    def predict_vehicle_allocation(self, latitude, longitude, time_slot):
+    @timed('optimize_streaming')
+    def _solve_chunk(self, chunk, n_regions, first_cluster, trips_left):
+        """Cluster one streamed chunk into regions, then five-shipment clusters, and build its trips."""
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+
+        features = self._shipment_features(chunk)
+        self.processed_shipments = pd.DataFrame({
+            'Shipment ID': features['Shipment ID'].to_numpy(),
+            'Latitude': chunk['Latitude'].to_numpy(dtype=np.float64),
+            'Longitude': chunk['Longitude'].to_numpy(dtype=np.float64),
+            'Distance': features['Distance'].to_numpy(dtype=np.float32),
+            'Time Slot Start': features['Time Slot Start'].to_numpy(dtype=np.int16),
+            'Time Slot End': features['Time Slot End'].to_numpy(dtype=np.int16),
+        })
+        STAGE_ROWS.inc(len(self.processed_shipments), stage='preprocess')
+
+        X = self.processed_shipments[['Latitude', 'Longitude']].to_numpy()
+        region_labels = MiniBatchKMeans(n_clusters=max(1, min(n_regions, len(X) // 5)),
+                                        random_state=42, n_init=3).fit_predict(X)
+        cluster_labels = np.empty(len(X), dtype=np.int64)
+        next_cluster = first_cluster
+        for region in np.unique(region_labels):
+            members = np.flatnonzero(region_labels == region)
+            n_clusters = max(1, len(members) // 5)
+            if n_clusters == 1:
+                local = np.zeros(len(members), dtype=np.int64)
+            else:
+                local = KMeans(n_clusters=n_clusters, random_state=42).fit_predict(X[members])
+            cluster_labels[members] = local + next_cluster
+            next_cluster += n_clusters
+
+        self.processed_shipments['Cluster'] = cluster_labels
+        CLUSTERS.inc(next_cluster - first_cluster)
+        return self._build_trips(trips_left)
+
+    @timed('assign')
+    def _build_trips(self, trips_left=None):
+        """Route every cluster, then assign vehicle types globally within the fleet counts.
+
+        ``trips_left`` overrides Number x MAX_TRIPS_PER_VEHICLE per vehicle row.
+        """
         try:
-            time_start, time_end = map(int, time_slot.split('-'))
-            new_distance = self._calculate_haversine_distance(
-                self.store['Latitute'], self.store['Longitude'],
-                latitude, longitude
+            groups = self.processed_shipments.groupby('Cluster', sort=False)
+            stats = groups.agg(Size=('Distance', 'size'), Farthest=('Distance', 'max'))
+            if stats.empty:
+                return []
+            if trips_left is None:
+                trips_left = self.vehicles['number'].to_numpy(dtype=float) * self.MAX_TRIPS_PER_VEHICLE
+            counts = pd.Series(trips_left, index=self.vehicles.index)
+            fleet = self.vehicles.sort_values('shipments_capacity', ascending=False)
+            limits = dict(
+                capacities=fleet['shipments_capacity'].to_numpy(dtype=float),
+                radii=fleet['max_trip_radius_(in_km)'].to_numpy(dtype=float),
+                priority=fleet['vehicle_type'].isin(PRIORITY_VEHICLE_TYPES).to_numpy(),
+                utilization_threshold=self.CAPACITY_UTILIZATION_THRESHOLD
             )
 
-            cluster_id = self._find_nearest_cluster(latitude, longitude)
-            cluster_data = self.processed_shipments[
-                self.processed_shipments['Cluster'] == cluster_id
-            ]
+            # Tours are vehicle-independent, so route only clusters some vehicle could take
+            could_fit, _ = vehicle_feasibility(stats['Size'], stats['Farthest'], np.zeros(len(stats)),
+                                               trip_time_limit=np.inf, **limits)
+            routable = set(stats.index[could_fit.any(axis=1)])
+            routes = {}
+            trip_minutes = np.full(len(stats), np.inf)
+            for position, (cluster_id, cluster_data) in enumerate(groups):
+                if cluster_id in routable:
+                    routes[cluster_id] = self._route_cluster(cluster_data)
+                    trip_minutes[position] = self._trip_minutes(routes[cluster_id][1], len(cluster_data))
 
-            if self._is_cluster_compatible(cluster_data, time_start, time_end, new_distance):
-                vehicle_type = self._get_cluster_vehicle_type(cluster_id)
-                if vehicle_type:
-                    self.logger.info(f"Using cluster {cluster_id}'s vehicle {vehicle_type}")
-                    return vehicle_type
+            _, cost = vehicle_feasibility(stats['Size'], stats['Farthest'], trip_minutes,
+                                          trip_time_limit=self.TRIP_TIME_LIMIT, **limits)
+            assignment = assign_by_regret(cost, counts.loc[fleet.index].to_numpy(dtype=float))
 
-            return self._assign_individual_vehicle(new_distance, time_end - time_start)
+            trips = []
+            for (cluster_id, cluster_data), vehicle_index in zip(groups, assignment):
+                if vehicle_index < 0:
+                    DROPPED_CLUSTERS.inc()
+                    DROPPED_SHIPMENTS.inc(len(cluster_data))
+                    continue
+                trip = self._cluster_trip(cluster_data, fleet.iloc[vehicle_index], *routes[cluster_id])
+                trip["Cluster"] = cluster_id  # Store cluster reference
+                trips.append(trip)
+            return trips
 
         except Exception as e:
-            self.logger.error(f"Prediction error: {str(e)}")
-            return None
+            self.logger.error(f"Trip assignment error: {e}")
+            raise
 
-    def _find_nearest_cluster(self, latitude, longitude):
-        cluster_centers = self.processed_shipments.groupby('Cluster')[
-            ['Latitude', 'Longitude']
-        ].mean().values
-        
-        distances = [
-            self._calculate_haversine_distance(latitude, longitude, center[0], center[1])
-            for center in cluster_centers
-        ]
-        return np.argmin(distances)
-
-    def _is_cluster_compatible(self, cluster_data, new_start, new_end, new_distance):
-        if cluster_data.empty:
+    @timed('expand')
+    def _finalize_trips(self, trips):
+        """Store trips, index clusters and return the columnar TripResult."""
+        try:
+            self._set_coverage(trips)
+            self.trips_df = pd.DataFrame(trips)
+            self._build_cluster_index()
+            self.result = TripResult.from_trips(self.trips_df, self.processed_shipments)
+
+            STAGE_ROWS.inc(len(self.result), stage='expand')
+            return self.result
+
+        except Exception as e:
+            self.logger.error(f"Trip expansion error: {e}")
+            raise
+
+    def _set_coverage(self, trips):
+        total_shipments = len(self.processed_shipments)
+        for trip in trips:
+            trip['Coverage'] = len(trip['Shipments']) / total_shipments if total_shipments > 0 else 0.0
+
+    def _build_cluster_index(self):
+        """Precompute per-cluster summaries and a haversine BallTree over centroids."""
+        summary = self.processed_shipments.groupby('Cluster').agg(
+            Latitude=('Latitude', 'mean'),
+            Longitude=('Longitude', 'mean'),
+            Slot_Start=('Time Slot Start', 'min'),
+            Slot_End=('Time Slot End', 'max'),
+            Max_Distance=('Distance', 'max'),
+            Size=('Distance', 'size')
+        )
+        if self.trips_df is not None and not self.trips_df.empty:
+            cluster_vehicles = self.trips_df.drop_duplicates('Cluster').set_index('Cluster')['Vehicle_Type']
+            summary['Vehicle_Type'] = cluster_vehicles.reindex(summary.index)
+        else:
+            summary['Vehicle_Type'] = None
+
+        self.cluster_summary = summary
+        # Insert lookups are rebuilt lazily from the new trips and shipments
+        self._trip_rows = None
+        self._shipment_coords = None
+        self._index_clusters()
+
+    def _index_clusters(self):
+        """Interval index over the distinct cluster (= trip) windows, with a centroid BallTree per window."""
+        windows, window_of = np.unique(self.cluster_summary[['Slot_Start', 'Slot_End']].to_numpy(dtype=np.float64),
+                                       axis=0, return_inverse=True)
+        self._window_index = IntervalIndex(windows[:, 0], windows[:, 1])
+        self._window_ids = {(start, end): window for window, (start, end) in enumerate(windows)}
+        self._window_trees = [self._window_tree(np.flatnonzero(window_of.ravel() == window))
+                              for window in range(len(windows))]
+
+    def _window_tree(self, positions):
+        """(summary positions, centroid BallTree) for one window; the tree is None when it has no clusters."""
+        from sklearn.neighbors import BallTree
+
+        if not len(positions):
+            return positions, None
+        coords = np.radians(self.cluster_summary[['Latitude', 'Longitude']].to_numpy(dtype=np.float64)[positions])
+        return positions, BallTree(coords, metric='haversine')
+
+    def _reindex_cluster(self, position, old_window):
+        """Refresh the index for one changed summary row, rebuilding only the window trees it touches."""
+        cluster = self.cluster_summary.iloc[position]
+        window = (float(cluster['Slot_Start']), float(cluster['Slot_End']))
+        if old_window is not None and old_window != window:
+            members = self._window_trees[self._window_ids[old_window]][0]
+            self._window_trees[self._window_ids[old_window]] = self._window_tree(members[members != position])
+
+        if window not in self._window_ids:
+            self._window_ids[window] = len(self._window_trees)
+            self._window_trees.append(self._window_tree(np.array([position])))
+            self._window_index = IntervalIndex(np.append(self._window_index.starts, window[0]),
+                                               np.append(self._window_index.ends, window[1]))
+        else:
+            members = self._window_trees[self._window_ids[window]][0]
+            self._window_trees[self._window_ids[window]] = self._window_tree(np.union1d(members, [position]))
+
+    def _nearest_overlapping_clusters(self, lats, lons, time_start, time_end, k=1):
+        """Summary positions of the ``k`` nearest clusters whose window overlaps the slot, per point.
+
+        Returns a (points x k) array padded with -1 when fewer clusters overlap.
+        """
+        points = np.radians(np.column_stack([lats, lons]))
+        distances, positions = [], []
+        for window in self._window_index.overlapping(time_start, time_end):
+            members, tree = self._window_trees[window]
+            if tree is None:
+                continue
+            distance, index = tree.query(points, k=min(k, len(members)))
+            distances.append(distance)
+            positions.append(members[index])
+
+        nearest = np.full((len(points), k), -1, dtype=np.int64)
+        if positions:
+            distances, positions = np.hstack(distances), np.hstack(positions)
+            order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            nearest[:, :order.shape[1]] = np.take_along_axis(positions, order, axis=1)
+        return nearest
+
+    def _is_cluster_compatible(self, cluster_id, new_start, new_end, new_distance):
+        if self.cluster_summary is None or cluster_id not in self.cluster_summary.index:
             return False
-            
-        cluster_start = cluster_data['Time Slot Start'].min()
-        cluster_end = cluster_data['Time Slot End'].max()
-        cluster_max_distance = cluster_data['Distance'].max()
-        return (new_start <= cluster_end) and (new_end >= cluster_start) and (new_distance <= (cluster_max_distance * 1.5))
+
+        cluster = self.cluster_summary.loc[cluster_id]
+        return slots_overlap(new_start, new_end, cluster['Slot_Start'], cluster['Slot_End']) and (new_distance <= (cluster['Max_Distance'] * 1.5))
 
     def _get_cluster_vehicle_type(self, cluster_id):
         try:
-            if self.trips_df is None or self.trips_df.empty:
+            if self.cluster_summary is None or cluster_id not in self.cluster_summary.index:
                 return None
-                
-            cluster_trips = self.trips_df[self.trips_df['Cluster'] == cluster_id]
-            return cluster_trips['Vehicle_Type'].iloc[0] if not cluster_trips.empty else None
+
+            vehicle_type = self.cluster_summary.at[cluster_id, 'Vehicle_Type']
+            return vehicle_type if pd.notna(vehicle_type) else None
         except Exception as e:
             self.logger.warning(f"Vehicle lookup error for cluster {cluster_id}: {str(e)}")
             return None
 
-    def _assign_individual_vehicle(self, distance, time_window_hours):
+    def _assign_individual_vehicle(self, distance, time_window_minutes, vehicle_types=None):
         try:
-            time_window_min = time_window_hours * 60
-            required_time = (distance * self.TRAVEL_TIME_PER_KM) + self.DELIVERY_TIME_PER_SHIPMENT
-
-            for _, vehicle in self.priority_vehicles.iterrows():
-                max_radius = vehicle['max_trip_radius_(in_km)']
-                capacity = vehicle['shipments_capacity']
-                
-                # Check if vehicle can handle the trip
-                if (distance <= max_radius and
-                    required_time <= min(time_window_min, self.TRIP_TIME_LIMIT)):
-                    return vehicle['vehicle_type']
-            
-            # Fallback to other vehicles
-            for _, vehicle in self.vehicles.iterrows():
-                max_radius = vehicle['max_trip_radius_(in_km)']
-                if distance <= max_radius:
-                    return vehicle['vehicle_type']
-            
-            return None
+            return self._assign_individual_vehicles(np.array([float(distance)]),
+                                                    np.array([float(time_window_minutes)]), vehicle_types)[0]
         except Exception as e:
             self.logger.error(f"Vehicle assignment error: {str(e)}")
             return None
+
+    @timed('predict')
     def predict_vehicle_allocation(self, latitude, longitude, time_slot):
         """Predict suitable vehicle for a new shipment"""
         try:
@@ -252,109 +595,321 @@ class SmartRouteOptimizer:
                 lon
             )
             
-            # Find best cluster match
-            cluster_id = self._find_nearest_cluster(lat, lon)
-            cluster_data = self.processed_shipments[
-                self.processed_shipments['Cluster'] == cluster_id
-            ]
-            
+            # Nearest cluster among those whose window overlaps the slot
+            time_start, time_end = parse_timeslot(time_slot)
+            position = self._nearest_overlapping_clusters([lat], [lon], time_start, time_end)[0, 0]
+
             # Check cluster compatibility
-            time_start, time_end = map(int, time_slot.split('-'))
-            if self._is_cluster_compatible(cluster_data, time_start, time_end, distance):
-                vehicle = self._get_cluster_vehicle_type(cluster_id)
-                if vehicle:
-                    return vehicle
+            if position >= 0:
+                cluster_id = self.cluster_summary.index[position]
+                if self._is_cluster_compatible(cluster_id, time_start, time_end, distance):
+                    vehicle = self._get_cluster_vehicle_type(cluster_id)
+                    if vehicle:
+                        return vehicle
                     
             # Fallback to individual vehicle assignment
             return self._assign_individual_vehicle(distance, time_end - time_start)
             
         except Exception as e:
             self.logger.error(f"Prediction failed: {str(e)}")
-            return None    
-    def _assign_vehicle_to_cluster(self, cluster_data):
-        try:
-            num_shipments = len(cluster_data)
-            store_point = (self.store['Latitute'], self.store['Longitude'])
-            distances = [self._calculate_haversine_distance(store_point[0], store_point[1], 
-                                                        point[0], point[1]) for point in cluster_data[['Latitude', 'Longitude']].values]
-            total_distance = sum(distances)
-            
-            earliest_start = cluster_data['Time Slot Start'].min()
-            latest_end = cluster_data['Time Slot End'].max()
-            available_time = (latest_end - earliest_start) * 60
-
-            for _, vehicle in self.priority_vehicles.iterrows():
-                # Convert to float explicitly
-                max_radius = float(vehicle['max_trip_radius_(in_km)'])
-                capacity = float(vehicle['shipments_capacity'])
-                
-                if (num_shipments <= capacity and
-                    (num_shipments / capacity) >= self.CAPACITY_UTILIZATION_THRESHOLD and
-                    total_distance <= max_radius):
-                    
-                    sorted_shipments = cluster_data.sort_values(by=['Time Slot Start', 'Distance'])
-                    return {
-                        'Trip_ID': f"Trip_{cluster_data['Cluster'].iloc[0]}",
-                        'Shipments': sorted_shipments['Shipment ID'].tolist(),
-                        'Vehicle_Type': vehicle['vehicle_type'],
-                        'Total_Distance': round(total_distance, 2),
-                        'Capacity_Utilization': f"{(num_shipments / capacity):.0%}",
-                        'Time_Utilization': f"{(total_distance * self.TRAVEL_TIME_PER_KM / available_time):.0%}" if available_time > 0 else "0%",
-                        'Cluster': cluster_data['Cluster'].iloc[0]
-                    }
             return None
-        except Exception as e:
-            self.logger.error(f"Cluster vehicle assignment error: {str(e)}")
+
+    @timed('predict_batch')
+    def predict_vehicle_allocations(self, latitudes, longitudes, time_slots):
+        """Predict vehicles for a batch of new shipments.
+
+        Returns a DataFrame with one row per input holding ``vehicle_type``
+        and ``error``; a bad item only fails its own row.
+        """
+        lat = pd.to_numeric(pd.Series(latitudes, dtype=object), errors='coerce').to_numpy(dtype=float)
+        lon = pd.to_numeric(pd.Series(longitudes, dtype=object), errors='coerce').to_numpy(dtype=float)
+        time_start, time_end = parse_timeslots(time_slots, errors='coerce')
+
+        n = len(lat)
+        errors = np.full(n, None, dtype=object)
+        errors[np.isnan(time_start) | np.isnan(time_end)] = 'Invalid time slot format'
+        errors[np.isnan(lat) | np.isnan(lon)] = 'Invalid coordinate format'
+        vehicle_types = np.full(n, None, dtype=object)
+
+        valid = np.flatnonzero(pd.isna(errors))
+        if len(valid):
+            lat, lon = lat[valid], lon[valid]
+            time_start, time_end = time_start[valid], time_end[valid]
+            distance = haversine_one_to_many(self.store['Latitute'], self.store['Longitude'], lat, lon)
+
+            # Nearest overlapping cluster, one index query per distinct slot in the batch
+            slots, slot_of = np.unique(np.column_stack([time_start, time_end]), axis=0, return_inverse=True)
+            slot_of = slot_of.ravel()
+            position = np.empty(len(lat), dtype=np.int64)
+            for slot, (slot_start, slot_end) in enumerate(slots):
+                rows = np.flatnonzero(slot_of == slot)
+                position[rows] = self._nearest_overlapping_clusters(lat[rows], lon[rows], slot_start, slot_end)[:, 0]
+
+            summary = self.cluster_summary
+            found = position >= 0
+            position = np.where(found, position, 0)
+            compatible = found & (distance <= summary['Max_Distance'].to_numpy()[position] * 1.5)
+            cluster_vehicle = summary['Vehicle_Type'].to_numpy(dtype=object)[position]
+            use_cluster = compatible & pd.notna(cluster_vehicle)
+
+            result = self._assign_individual_vehicles(distance, time_end - time_start)
+            result[use_cluster] = cluster_vehicle[use_cluster]
+            vehicle_types[valid] = result
+
+        return pd.DataFrame({'vehicle_type': vehicle_types, 'error': errors}, dtype=object)
+
+    def _assign_individual_vehicles(self, distance, time_window_minutes, vehicle_types=None):
+        """Per shipment: first priority vehicle within radius and time limits, else any vehicle within radius.
+
+        ``vehicle_types`` restricts the choice to those types, e.g. the ones with vehicles left.
+        """
+        priority_vehicles, vehicles = self.priority_vehicles, self.vehicles
+        if vehicle_types is not None:
+            priority_vehicles = priority_vehicles[priority_vehicles['vehicle_type'].isin(vehicle_types)]
+            vehicles = vehicles[vehicles['vehicle_type'].isin(vehicle_types)]
+
+        vehicle_types = np.full(len(distance), None, dtype=object)
+        unassigned = np.ones(len(distance), dtype=bool)
+        required_time = (distance * self.TRAVEL_TIME_PER_KM) + self.DELIVERY_TIME_PER_SHIPMENT
+        time_limit = np.minimum(time_window_minutes, self.TRIP_TIME_LIMIT)
+
+        for vehicle_type, max_radius in zip(priority_vehicles['vehicle_type'],
+                                            priority_vehicles['max_trip_radius_(in_km)']):
+            fits = unassigned & (distance <= max_radius) & (required_time <= time_limit)
+            vehicle_types[fits] = vehicle_type
+            unassigned &= ~fits
+
+        # Fallback to other vehicles
+        for vehicle_type, max_radius in zip(vehicles['vehicle_type'],
+                                            vehicles['max_trip_radius_(in_km)']):
+            fits = unassigned & (distance <= max_radius)
+            vehicle_types[fits] = vehicle_type
+            unassigned &= ~fits
+
+        return vehicle_types
+
+    @timed('insert')
+    def insert_shipment(self, shipment_id, latitude, longitude, time_slot, candidates=8):
+        """Add a late shipment to the cheapest feasible existing trip, or open a new one.
+
+        Only the ``candidates`` nearest clusters whose window overlaps the
+        slot are tried. A trip qualifies if its vehicle still has capacity
+        and radius for the stop and the longer tour stays within TRIP_TIME_LIMIT.
+        trips_df, processed_shipments and the cluster summary are updated in
+        place and ``result`` is rebuilt from them; no re-optimization is run.
+        Raises ValueError if ``shipment_id`` is already present.
+        """
+        if self._shipment_coords is None:
+            self._shipment_coords = self.processed_shipments.set_index('Shipment ID')[
+                ['Latitude', 'Longitude', 'Time Slot Start']
+            ]
+        if shipment_id in self._shipment_coords.index:
+            raise ValueError(f"Shipment {shipment_id} is already planned")
+
+        lat, lon = float(latitude), float(longitude)
+        time_start, time_end = parse_timeslot(time_slot)
+        distance = float(self._calculate_haversine_distance(self.store['Latitute'], self.store['Longitude'], lat, lon))
+
+        if self._trip_rows is None:
+            self._trip_rows = {cluster: row for row, cluster in enumerate(self.trips_df['Cluster'])} \
+                if not self.trips_df.empty else {}
+        fleet = self.vehicles.set_index('vehicle_type')
+
+        best = None
+        positions = self._nearest_overlapping_clusters([lat], [lon], time_start, time_end, k=candidates)[0]
+        for cluster_id in self.cluster_summary.index[positions[positions >= 0]]:
+            row = self._trip_rows.get(cluster_id)
+            if row is None:
+                continue
+
+            trip = self.trips_df.iloc[row]
+            vehicle = fleet.loc[trip['Vehicle_Type']]
+            if (len(trip['Shipments']) + 1 > vehicle['shipments_capacity'] or
+                    distance > vehicle['max_trip_radius_(in_km)']):
+                continue
+
+            position, added_km = self._cheapest_insertion(trip['Shipments'], lat, lon, time_start)
+            if position is None:
+                continue
+            if self._trip_minutes(trip['Total_Distance'] + added_km, len(trip['Shipments']) + 1) > self.TRIP_TIME_LIMIT:
+                continue
+            if best is None or added_km < best[2]:
+                best = (cluster_id, position, added_km)
+
+        if best is not None:
+            cluster_id, position, added_km = best
+            row = self._trip_rows[cluster_id]
+            trip = self.trips_df.iloc[row]
+            shipments = list(trip['Shipments'])
+            shipments.insert(position, shipment_id)
+            self._update_trip(row, shipments, trip['Total_Distance'] + added_km, cluster_id, time_start, time_end)
+        else:
+            # Only types with vehicles left in the fleet counts can open a trip
+            vehicle_type = self._assign_individual_vehicle(distance, time_end - time_start, self._vehicle_types_left())
+            cluster_id = int(self.cluster_summary.index.max()) + 1
+            added_km = 2 * distance
+            if vehicle_type:
+                self._open_trip(cluster_id, shipment_id, vehicle_type, added_km, time_start, time_end)
+
+        self._add_processed_shipment(shipment_id, lat, lon, time_slot, distance, time_start, time_end, cluster_id)
+        self._update_cluster_summary(cluster_id, lat, lon, distance, time_start, time_end)
+        self.result = TripResult.from_trips(self.trips_df, self.processed_shipments)
+
+        row = self._trip_rows.get(cluster_id)
+        if row is None:
+            self.logger.warning(f"No vehicle can take shipment {shipment_id}")
             return None
+        trip = self.trips_df.iloc[row]
+        return {'Trip_ID': trip['Trip_ID'], 'Vehicle_Type': trip['Vehicle_Type'],
+                'New_Trip': best is None, 'Added_Distance': round(added_km, 2)}
 
-    def plot_shipments_on_map(self, trips_df):
-        base_map = folium.Map(location=[self.store['Latitute'], self.store['Longitude']], zoom_start=13)
-        folium.Marker(
-            location=[self.store['Latitute'], self.store['Longitude']],
-            popup="Store Location",
-            icon=folium.Icon(color='black', icon='info-sign')
-        ).add_to(base_map)
-        
-        vehicle_colors = {'3W': 'blue', '4W-EV': 'green', '4W': 'red'}
-        for _, trip in trips_df.iterrows():
-            shipment_coords = []
-            for shipment_id in trip['Shipments'].split(', '):
-                shipment = self.processed_shipments[self.processed_shipments['Shipment ID'] == int(shipment_id)]
-                if not shipment.empty:
-                    shipment_coords.append([shipment['Latitude'].values[0], shipment['Longitude'].values[0]])
-            
-            route_coords = [[self.store['Latitute'], self.store['Longitude']]] + shipment_coords
-            folium.PolyLine(route_coords, color=vehicle_colors.get(trip['Vehicle_Type'], 'gray'), 
-                          weight=5, opacity=0.7).add_to(base_map)
-            folium.Marker(
-                location=route_coords[-1],
-                popup=f"Trip ID: {trip['TRIP_ID']}<br>Vehicle: {trip['Vehicle_Type']}",
-                icon=folium.Icon(color=vehicle_colors.get(trip['Vehicle_Type'], 'gray'), icon='cloud')
-            ).add_to(base_map)
-
-        base_map.save("optimized_routes_map.html")
-        print("Map saved as 'optimized_routes_map.html'")
+    def _vehicle_types_left(self):
+        """Vehicle types whose Number x MAX_TRIPS_PER_VEHICLE is not yet used up by trips_df."""
+        limits = self.vehicles.set_index('vehicle_type')['number'] * self.MAX_TRIPS_PER_VEHICLE
+        used = self.trips_df['Vehicle_Type'].value_counts() if not self.trips_df.empty else pd.Series(dtype=int)
+        left = limits - used.reindex(limits.index, fill_value=0)
+        return left.index[left > 0].tolist()
+
+    def _cheapest_insertion(self, trip_shipments, lat, lon, time_start):
+        """Best (position, added km) for a new stop, keeping stops ordered by slot start."""
+        stops = self._shipment_coords.loc[trip_shipments]
+        path_lats = np.concatenate([[self.store['Latitute']], stops['Latitude'].to_numpy(), [self.store['Latitute']]])
+        path_lons = np.concatenate([[self.store['Longitude']], stops['Longitude'].to_numpy(), [self.store['Longitude']]])
+        if self.distance_provider is None:
+            to_new = haversine_one_to_many(lat, lon, path_lats, path_lons)
+            existing = haversine(path_lats[:-1], path_lons[:-1], path_lats[1:], path_lons[1:])
+            added = to_new[:-1] + to_new[1:] - existing
+        else:
+            legs = self.distance_provider.matrix(path_lats, path_lons, path_lats, path_lons)[0]
+            into_new = self.distance_provider.matrix(path_lats[:-1], path_lons[:-1], [lat], [lon])[0][:, 0]
+            out_of_new = self.distance_provider.matrix([lat], [lon], path_lats[1:], path_lons[1:])[0][0]
+            added = into_new + out_of_new - legs[np.arange(len(path_lats) - 1), np.arange(1, len(path_lats))]
+
+        starts = np.concatenate([[-np.inf], stops['Time Slot Start'].to_numpy(dtype=float), [np.inf]])
+        allowed = (starts[:-1] <= time_start) & (time_start <= starts[1:])
+        if not allowed.any():
+            return None, None
+        added[~allowed] = np.inf
+        position = int(np.argmin(added))
+        return position, float(added[position])
+
+    def _update_trip(self, row, shipments, total_distance, cluster_id, time_start, time_end):
+        vehicle = self.vehicles.set_index('vehicle_type').loc[self.trips_df.iloc[row]['Vehicle_Type']]
+        cluster = self.cluster_summary.loc[cluster_id]
+        available_time = max(cluster['Slot_End'], time_end) - min(cluster['Slot_Start'], time_start)
+        column = self.trips_df.columns.get_loc
+        trip_minutes = self._trip_minutes(total_distance, len(shipments))
+        self.trips_df.iat[row, column('Shipments')] = shipments
+        self.trips_df.iat[row, column('Total_Distance')] = round(total_distance, 2)
+        self.trips_df.iat[row, column('Trip_Time')] = round(trip_minutes, 2)
+        self.trips_df.iat[row, column('Capacity_Utilization')] = len(shipments) / float(vehicle['shipments_capacity'])
+        self.trips_df.iat[row, column('Time_Utilization')] = trip_minutes / available_time if available_time > 0 else 0.0
+
+    def _open_trip(self, cluster_id, shipment_id, vehicle_type, total_distance, time_start, time_end):
+        vehicle = self.vehicles.set_index('vehicle_type').loc[vehicle_type]
+        available_time = time_end - time_start
+        trip_minutes = self._trip_minutes(total_distance, 1)
+        trip = {
+            'Trip_ID': f"Trip_{cluster_id}",
+            'Shipments': [shipment_id],
+            'Vehicle_Type': vehicle_type,
+            'Total_Distance': round(total_distance, 2),
+            'Trip_Time': round(trip_minutes, 2),
+            'Capacity_Utilization': 1 / float(vehicle['shipments_capacity']),
+            'Time_Utilization': trip_minutes / available_time if available_time > 0 else 0.0,
+            'Cluster': cluster_id,
+            'Coverage': 0.0
+        }
+        self.trips_df = pd.concat([self.trips_df, pd.DataFrame([trip])], ignore_index=True)
+        self._trip_rows[cluster_id] = len(self.trips_df) - 1
+
+    def _add_processed_shipment(self, shipment_id, lat, lon, time_slot, distance, time_start, time_end, cluster_id):
+        row = {'Shipment ID': shipment_id, 'Latitude': lat, 'Longitude': lon, 'Delivery Timeslot': time_slot,
+               'Distance': distance, 'Time Slot Start': time_start, 'Time Slot End': time_end, 'Cluster': cluster_id}
+        self.processed_shipments = pd.concat(
+            [self.processed_shipments, pd.DataFrame([row], columns=self.processed_shipments.columns)],
+            ignore_index=True
+        )
+        self._shipment_coords.loc[shipment_id] = [lat, lon, time_start]
+
+        # Coverage depends on the total shipment count, so refresh it for every trip
+        total_shipments = len(self.processed_shipments)
+        self.trips_df['Coverage'] = self.trips_df['Shipments'].map(len) / total_shipments
+
+    def _update_cluster_summary(self, cluster_id, lat, lon, distance, time_start, time_end):
+        summary = self.cluster_summary
+        old_window = None
+        if cluster_id in summary.index:
+            cluster = summary.loc[cluster_id]
+            old_window = (float(cluster['Slot_Start']), float(cluster['Slot_End']))
+            size = cluster['Size']
+            summary.loc[cluster_id, ['Latitude', 'Longitude', 'Slot_Start', 'Slot_End', 'Max_Distance', 'Size']] = [
+                (cluster['Latitude'] * size + lat) / (size + 1),
+                (cluster['Longitude'] * size + lon) / (size + 1),
+                min(cluster['Slot_Start'], time_start),
+                max(cluster['Slot_End'], time_end),
+                max(cluster['Max_Distance'], distance),
+                size + 1
+            ]
+        else:
+            row = self._trip_rows.get(cluster_id)
+            vehicle_type = self.trips_df.iloc[row]['Vehicle_Type'] if row is not None else None
+            summary.loc[cluster_id] = [lat, lon, time_start, time_end, distance, 1, vehicle_type]
+
+        self._reindex_cluster(summary.index.get_loc(cluster_id), old_window)
+
+    def _trip_minutes(self, tour_km, stops):
+        """Driving plus delivery time for a tour of ``tour_km`` with ``stops`` drops."""
+        return tour_km * self.TRAVEL_TIME_PER_KM + stops * self.DELIVERY_TIME_PER_SHIPMENT
+
+    def _route_cluster(self, cluster_data):
+        """Real store -> stops -> store tour, earlier time slots first: (stop order, km)."""
+        key = None
+        if self._route_cache is not None:
+            # Tours depend only on the stops, so runs that differ in other constants can share them
+            key = (self.ROUTE_TIME_BUDGET, getattr(self.distance_provider, 'name', None),
+                   tuple(cluster_data['Shipment ID'].tolist()))
+            if key in self._route_cache:
+                return self._route_cache[key]
+
+        route = build_route(
+            self.store['Latitute'], self.store['Longitude'],
+            cluster_data['Latitude'].to_numpy(), cluster_data['Longitude'].to_numpy(),
+            groups=cluster_data['Time Slot Start'].to_numpy(),
+            time_budget=self.ROUTE_TIME_BUDGET,
+            provider=self.distance_provider
+        )
+        if key is not None:
+            self._route_cache[key] = route
+        return route
+
+    def _cluster_trip(self, cluster_data, vehicle, stop_order, tour_km):
+        num_shipments = len(cluster_data)
+        capacity = float(vehicle['shipments_capacity'])
+        available_time = cluster_data['Time Slot End'].max() - cluster_data['Time Slot Start'].min()
+        trip_minutes = self._trip_minutes(tour_km, num_shipments)
+        return {
+            'Trip_ID': f"Trip_{cluster_data['Cluster'].iloc[0]}",
+            'Shipments': cluster_data['Shipment ID'].to_numpy()[stop_order].tolist(),
+            'Vehicle_Type': vehicle['vehicle_type'],
+            'Total_Distance': round(tour_km, 2),
+            'Trip_Time': round(trip_minutes, 2),
+            'Capacity_Utilization': num_shipments / capacity,
+            'Time_Utilization': trip_minutes / available_time if available_time > 0 else 0.0,
+            'Cluster': cluster_data['Cluster'].iloc[0]
+        }
+
+    @timed('render')
+    def plot_shipments_on_map(self, result, out_file="optimized_routes_map.html"):
+        """Render trips as per-vehicle GeoJSON layers with client-side marker clustering."""
+        from map_render import render_trip_map
+
+        render_trip_map(result.to_flat(), self.store['Latitute'], self.store['Longitude'], out_file)
+        print(f"Map saved as '{out_file}'")
 
 if __name__ == "__main__":
-    try:
-        optimizer = SmartRouteOptimizer(logging_level=logging.DEBUG)
-        optimizer.load_data().preprocess_data()
-        trips_df = optimizer.optimize_trips()
-        write_output_data(trips_df)
-        Read_Output_data()
-        
-        optimizer.plot_shipments_on_map(trips_df)
-        
-        # Test prediction with enhanced error handling
-        test_coords = [
-            (19.075887, 72.850804, "9-12"),  # Mumbai
-            (19.0962184,72.9124746, "9-12"),    
-            (12.9716, 77.5946, "10-14")   
-        ]
-        
-        for lat, lon, slot in test_coords:
-            vehicle = optimizer.predict_vehicle_allocation(lat, lon, slot)
-            print(f"Prediction for ({lat}, {lon}) @ {slot}: {vehicle}")
-            
-    except Exception as e:
-        print(f"Critical error in main execution: {str(e)}")
\ No newline at end of file
+    # Kept for old habits; the smartroute CLI is the entry point
+    import sys
+    from smartroute import main
+
+    sys.exit(main())
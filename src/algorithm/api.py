@@ -1,12 +1,58 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, g
 from flask_cors import CORS
 from algo import SmartRouteOptimizer
+from model_service import OptimizerService
+from serving_snapshot import default_snapshot_dir
+from jobs import JobManager
+from result_cache import ResultCache, optimization_key
+from road_distance import default_provider
+from timeslots import parse_timeslot
+from trip_result import RECORD_FIELDS
+from partition import GRID_BITS
+from metrics import CONTENT_TYPE, HTTP_SECONDS, SlowRequestProfiler, render as render_metrics
+from data import DATA_FOLDER
+import base64
+import hashlib
+import json
 import os
+import time
 
 app = Flask(__name__)
 
-# Enable CORS globally
-CORS(app)
+# Enable CORS globally (ETag must be readable for conditional requests)
+CORS(app, expose_headers=['ETag'])
+
+# Opt-in per-request cProfile dumps for slow calls (SMARTROUTE_PROFILE_SLOW_MS)
+slow_request_profiler = SlowRequestProfiler(out_dir=os.path.join(DATA_FOLDER, 'profiles'))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    slow_request_profiler.start()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unmatched'
+    profile_path = slow_request_profiler.stop(endpoint)
+    if profile_path:
+        app.logger.warning(f"Slow request {request.method} {request.path}; profile written to {profile_path}")
+    HTTP_SECONDS.observe(time.perf_counter() - g.request_started,
+                         endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return app.response_class(render_metrics(), content_type=CONTENT_TYPE)
+
+
+# Warm, shared optimizer reused by every prediction request; worker processes
+# share one fitted model through a memory-mapped snapshot. It starts on the
+# first prediction request (or at launch under __main__), not on import.
+optimizer_service = OptimizerService(snapshot_dir=default_snapshot_dir())
+
 @app.route('/api/predict-vehicle', methods=['POST'])
 def predict_vehicle():
     try:
@@ -24,12 +70,9 @@ def predict_vehicle():
         except ValueError:
             return jsonify({'error': 'Invalid coordinate format'}), 400
 
-        # Initialize optimizer and load data
-        optimizer = SmartRouteOptimizer()
+        # Reuse the process-level model instead of rebuilding it per request
         try:
-            optimizer.load_data().preprocess_data()
-            # Add this critical line to generate clusters
-            optimizer.optimize_trips()  # This creates the Cluster column
+            optimizer = optimizer_service.optimizer
         except Exception as e:
             return jsonify({'error': f'Data processing failed: {str(e)}'}), 500
 
@@ -55,36 +98,339 @@ def predict_vehicle():
             'status': 'error',
             'message': f'Prediction failed: {str(e)}'
         }), 500
+@app.route('/api/predict-vehicles', methods=['POST'])
+def predict_vehicles():
+    try:
+        data = request.get_json()
+        if isinstance(data, dict):
+            data = data.get('shipments')
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a JSON array of {latitude, longitude, time_slot} objects'}), 400
+
+        try:
+            optimizer = optimizer_service.optimizer
+        except Exception as e:
+            return jsonify({'error': f'Data processing failed: {str(e)}'}), 500
+
+        required_fields = ['latitude', 'longitude', 'time_slot']
+        items = [item if isinstance(item, dict) else {} for item in data]
+        predictions = optimizer.predict_vehicle_allocations(
+            [item.get('latitude') for item in items],
+            [item.get('longitude') for item in items],
+            [item.get('time_slot') for item in items]
+        )
+
+        results = []
+        for index, (item, vehicle_type, error) in enumerate(zip(items, predictions['vehicle_type'], predictions['error'])):
+            if not all(field in item for field in required_fields):
+                error = 'Missing required fields (latitude, longitude, time_slot)'
+            if error:
+                results.append({'index': index, 'status': 'error', 'vehicle_type': None, 'message': error})
+            elif vehicle_type:
+                results.append({'index': index, 'status': 'success', 'vehicle_type': vehicle_type,
+                                'message': 'Vehicle allocated successfully'})
+            else:
+                results.append({'index': index, 'status': 'success', 'vehicle_type': None,
+                                'message': 'Location too far for available vehicles'})
+
+        return jsonify({'status': 'success', 'results': results})
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Prediction failed: {str(e)}'
+        }), 500
+
+OPTIMIZATION_STAGES = ['load', 'preprocess', 'optimize', 'render']
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# Results keyed by a hash of the inputs and optimizer constants
+result_cache = ResultCache(disk_dir=os.path.join(DATA_FOLDER, '.result_cache'))
+
+# Stored runs (TripResult by run id) served page by page from /api/runs/<run_id>/trips
+trip_runs = ResultCache(memory_items=8, disk_dir=os.path.join(DATA_FOLDER, '.runs'), name='run')
+
+# Results for posted shipment data stay in memory unless SMARTROUTE_PERSIST_POSTED=1
+PERSIST_POSTED_RESULTS = os.environ.get('SMARTROUTE_PERSIST_POSTED') == '1'
+
+# Road legs persist across runs; only unseen pairs reach OSRM
+road_distances = default_provider(cache_path=os.path.join(DATA_FOLDER, 'road_distances.sqlite'))
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def load_optimizer(payload):
+    """Optimizer with the posted records (or the workbook) loaded."""
+    optimizer = SmartRouteOptimizer()
+    if payload.get('shipments') is not None:
+        # Solve the posted data directly; no workbook parsing or xlsx writing
+        optimizer.load_records(payload['shipments'], payload.get('vehicles'), payload.get('store'))
+    else:
+        optimizer.load_data()
+    if payload.get('distance') == 'road':
+        optimizer.distance_provider = road_distances
+    return optimizer
+
+
+def _persist(payload):
+    """Whether results for ``payload`` may be written to the on-disk caches."""
+    return payload.get('shipments') is None or PERSIST_POSTED_RESULTS
+
+
+def run_optimization(payload, progress=lambda stage: None):
+    """Full load -> preprocess -> optimize -> render pipeline, reporting each stage."""
+    payload = payload or {}
+
+    progress('load')
+    optimizer = load_optimizer(payload)
+
+    options = {'method': payload.get('method', 'kmeans'), 'engine': payload.get('engine', 'cluster')}
+    # 'legacy' keeps the flat per-shipment rows the frontend reads; 'compact' is trips + stop arrays
+    result_format = payload.get('format', 'legacy')
+    if result_format not in ('legacy', 'compact'):
+        raise ValueError(f"Unknown result format: {result_format}")
+    run_id = optimization_key(optimizer, options)
+    cached = result_cache.get(f"{run_id}-{result_format}")
+    if cached is not None and run_id in trip_runs:
+        return cached
+
+    progress('preprocess')
+    optimizer.preprocess_data()
+
+    progress('optimize')
+    optimized_trips = optimizer.optimize_trips(**options)
+
+    # Posted payloads skip writing the map file unless asked for it
+    if payload.get('render', payload.get('shipments') is None):
+        progress('render')
+        optimizer.plot_shipments_on_map(optimized_trips)
+
+    trip_runs.put(run_id, optimized_trips, persist=_persist(payload))
+    result = {
+        'run_id': run_id,
+        'format': result_format,
+        'trips': optimized_trips.to_legacy().to_dict(orient='records') if result_format == 'legacy'
+        else optimized_trips.to_dict(),
+        'trips_url': f'/api/runs/{run_id}/trips',
+        'map_url': f'shipments_map.html'
+    }
+    result_cache.put(f"{run_id}-{result_format}", result, persist=_persist(payload))
+    return result
+
+
+optimization_jobs = JobManager(run_optimization, OPTIMIZATION_STAGES)
+
+
 @app.route('/api/optimize-routes', methods=['POST'])
 def optimize_routes():
     try:
-        shipment_data = request.get_json()
+        if request.mimetype == ARROW_STREAM_MIMETYPE:
+            shipment_data = {'shipments': request.get_data(), 'render': False}
+        else:
+            shipment_data = request.get_json(silent=True)
 
-        # Initialize the optimizer
-        optimizer = SmartRouteOptimizer()
+        result = run_optimization(shipment_data)
 
-        # Load and preprocess the data
-        optimizer.load_data()  
-        optimizer.preprocess_data()
+        # The run id is a content hash, so it doubles as a strong ETag
+        etag = f'"{result["run_id"]}-{result["format"]}"'
+        if _not_modified(etag):
+            response = app.response_class(status=304)
+        else:
+            # Return the optimized trips and the map URL
+            response = jsonify(result)
+        response.headers['ETag'] = etag
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
 
-        # Optimize the trips
-        optimized_trips = optimizer.optimize_trips()
 
-        optimizer.plot_shipments_on_map(optimized_trips)
-        # Move the generated map to the static folder
+def _not_modified(etag):
+    """Whether the request's If-None-Match already names ``etag``."""
+    tags = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+    return etag in tags or '*' in tags
 
-        # Convert the result into a JSON serializable format
-        result = optimized_trips.to_dict(orient='records')
-        
-        # Return the optimized trips and the map URL
-        return jsonify({
-            'trips': result,
-            'map_url': f'shipments_map.html'
-        })
+
+def _encode_cursor(run_id, row):
+    return base64.urlsafe_b64encode(f"{run_id[:16]}:{row}".encode()).decode().rstrip('=')
+
+
+def _decode_cursor(run_id, cursor):
+    """Trip position after which the next page starts (-1 without a cursor)."""
+    if not cursor:
+        return -1
+    try:
+        prefix, row = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split(':')
+        if prefix != run_id[:16]:
+            raise ValueError
+        return int(row)
+    except ValueError:
+        raise ValueError('Invalid cursor for this run')
+
+
+def _worker_count(value):
+    """Client-requested process count, capped at this host's CPUs (None lets the pool decide)."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError('workers must be a positive integer')
+    return min(value, os.cpu_count() or 1)
+
+
+def _region_level(value):
+    """Spatial tiling depth of a partitioned run: 4**level tiles per timeslot, level 0..GRID_BITS."""
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= GRID_BITS:
+        raise ValueError(f'region_level must be an integer from 0 to {GRID_BITS}')
+    return value
+
+
+def _list_arg(args, name):
+    """Comma-separated and/or repeated query argument as a list (None when absent)."""
+    values = [value.strip() for raw in args.getlist(name) for value in raw.split(',') if value.strip()]
+    return values or None
+
+
+def _trip_filters(args):
+    """TripResult.trip_rows keyword arguments from query parameters."""
+    filters = {'vehicle_types': _list_arg(args, 'vehicle_type'), 'trip_ids': _list_arg(args, 'trip_id')}
+    if args.get('timeslot'):
+        filters['time_window'] = parse_timeslot(args['timeslot'])
+    if args.get('bbox'):
+        bbox = [float(value) for value in args['bbox'].split(',')]
+        if len(bbox) != 4:
+            raise ValueError('bbox must be min_lat,min_lon,max_lat,max_lon')
+        filters['bbox'] = bbox
+    return filters
+
+
+@app.route('/api/runs/<run_id>/trips', methods=['GET'])
+def run_trips(run_id):
+    """One page of a stored run's trips, filtered server-side and projected to ``fields``."""
+    result = trip_runs.get(run_id)
+    if result is None:
+        return jsonify({'error': 'Unknown run id'}), 404
+    # A run never changes, so one page URL always has the same body
+    etag = f'"{run_id}"'
+    if _not_modified(etag):
+        response = app.response_class(status=304)
+        response.headers['ETag'] = etag
+        return response
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        after = _decode_cursor(run_id, request.args.get('cursor'))
+        fields = _list_arg(request.args, 'fields')
+        rows = result.trip_rows(**_trip_filters(request.args))
+        page = rows[rows > after][:limit]
+        trips = result.records(page, fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    has_more = len(page) == limit and page[-1] < rows[-1]
+    response = jsonify({
+        'run_id': run_id,
+        'total': len(rows),
+        'trips': trips,
+        'next_cursor': _encode_cursor(run_id, int(page[-1])) if has_more else None
+    })
+    response.headers['ETag'] = etag
+    return response
+
+
+@app.route('/api/optimize-routes/stream', methods=['POST'])
+def stream_optimize_routes():
+    """NDJSON stream of trips, emitted partition by partition as each one is solved.
+
+    Lines are ``{"type": "run"}`` first, then one ``{"type": "trip"}`` per
+    trip and a final ``{"type": "done"}`` (or ``{"type": "error"}``). The
+    finished run is stored, so it can be paged through /api/runs/<run_id>/trips.
+    The ETag covers the run and the projected fields; a matching
+    If-None-Match gets 304 without solving anything.
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        fields = _list_arg(request.args, 'fields') or payload.get('fields') or RECORD_FIELDS
+        unknown = [field for field in fields if field not in RECORD_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown trip fields: {', '.join(unknown)}")
+        options = {'method': payload.get('method', 'kmeans'), 'engine': payload.get('engine', 'cluster'),
+                   'partition_by': 'timeslot', 'region_level': _region_level(payload.get('region_level', 0))}
+        workers = _worker_count(payload.get('workers'))
+        optimizer = load_optimizer(payload)
+        run_id = optimization_key(optimizer, options)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+    etag = f'"{run_id}-{hashlib.sha256(",".join(fields).encode()).hexdigest()[:12]}"'
+    if _not_modified(etag):
+        response = app.response_class(status=304)
+        response.headers['ETag'] = etag
+        return response
+
+    def generate():
+        yield json.dumps({'type': 'run', 'run_id': run_id}) + '\n'
+        try:
+            stored = trip_runs.get(run_id)
+            if stored is not None:
+                parts = [stored]
+            else:
+                optimizer.preprocess_data()
+                parts = optimizer.iter_trips(options['method'], options['engine'],
+                                             region_level=options['region_level'], workers=workers)
+            count = 0
+            for part in parts:
+                for record in part.records(fields=fields):
+                    yield json.dumps({'type': 'trip', **record}, default=str) + '\n'
+                count += len(part.trips)
+            if stored is None:
+                trip_runs.put(run_id, optimizer.result, persist=_persist(payload))
+            yield json.dumps({'type': 'done', 'run_id': run_id, 'trips': count,
+                              'trips_url': f'/api/runs/{run_id}/trips'}) + '\n'
+        except Exception as e:
+            app.logger.error(f"Streaming optimization failed: {e}")
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.headers['ETag'] = etag
+    return response
+
+
+@app.route('/api/optimize-jobs', methods=['POST'])
+def submit_optimize_job():
+    payload = request.get_json(silent=True) or {}
+    job_id = optimization_jobs.submit(payload)
+    return jsonify({
+        'job_id': job_id,
+        'status_url': f'/api/optimize-jobs/{job_id}',
+        'result_url': f'/api/optimize-jobs/{job_id}/result'
+    }), 202
+
+
+@app.route('/api/optimize-jobs/<job_id>', methods=['GET'])
+def optimize_job_status(job_id):
+    job = optimization_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/optimize-jobs/<job_id>/result', methods=['GET'])
+def optimize_job_result(job_id):
+    job = optimization_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id'}), 404
+    if job.state == 'failed':
+        return jsonify({'error': job.error}), 500
+    if job.state != 'done':
+        return jsonify(job.to_dict()), 202
+    return jsonify(job.result)
+
 
 # To run the app
 if __name__ == "__main__":
+    try:
+        optimizer_service.start()
+    except Exception as e:
+        app.logger.error(f"Initial optimizer build failed: {e}")
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,309 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from data import DATA_FOLDER, SHIPMENTS_SHEET, STORE_SHEET, VEHICLES_SHEET
+
+STORE = (19.075887, 72.877911)
+# Share of shipments per delivery timeslot (morning-heavy, like the sample data)
+TIMESLOT_MIX = {
+    "07:00:00-09:30:00": 0.20,
+    "09:30:00-12:00:00": 0.35,
+    "12:00:00-14:30:00": 0.25,
+    "14:30:00-17:00:00": 0.20,
+}
+# (vehicle type, vehicles per 1k shipments, capacity, max radius km); "Any" = unbounded
+FLEET = [("3W", 10, 5, 15), ("4W-EV", 5, 8, 20), ("4W", "Any", 25, "Any")]
+BASELINE_FILE = os.path.join(DATA_FOLDER, "bench_baseline.json")
+# Cold-start budget (seconds) for importing each entry module in a fresh interpreter
+IMPORT_BUDGETS = {'smartroute': 0.1, 'algo': 1.0}
+# Backends that must only load when a command actually needs them
+LAZY_BACKENDS = ('sklearn', 'scipy', 'matplotlib', 'folium', 'openpyxl', 'xlsxwriter')
+
+
+def generate_scenario(n_shipments, distribution='clustered', seed=42, radius_km=20.0,
+                      hotspots=None, timeslot_mix=TIMESLOT_MIX):
+    """Seeded synthetic city: shipments, vehicles and store frames with the workbook's columns.
+
+    ``distribution='clustered'`` draws shipments around Gaussian hotspots
+    (one per ~2k shipments by default); ``'uniform'`` spreads them over a
+    disc of ``radius_km`` around the store.
+    """
+    rng = np.random.default_rng(seed)
+    km_per_deg_lat = 111.0
+    km_per_deg_lon = 111.0 * np.cos(np.radians(STORE[0]))
+
+    if distribution == 'uniform':
+        radius = radius_km * np.sqrt(rng.random(n_shipments))
+        angle = rng.random(n_shipments) * 2 * np.pi
+        north, east = radius * np.sin(angle), radius * np.cos(angle)
+    elif distribution == 'clustered':
+        hotspots = hotspots or max(5, n_shipments // 2_000)
+        centre_radius = radius_km * 0.8 * np.sqrt(rng.random(hotspots))
+        centre_angle = rng.random(hotspots) * 2 * np.pi
+        spread = rng.uniform(0.3, 2.0, hotspots)  # km
+        weights = rng.dirichlet(np.ones(hotspots))
+        which = rng.choice(hotspots, size=n_shipments, p=weights)
+        north = centre_radius[which] * np.sin(centre_angle[which]) + rng.normal(0, spread[which])
+        east = centre_radius[which] * np.cos(centre_angle[which]) + rng.normal(0, spread[which])
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+
+    slots = list(timeslot_mix)
+    probabilities = np.asarray(list(timeslot_mix.values()), dtype=float)
+    shipments = pd.DataFrame({
+        "Shipment ID": np.arange(1, n_shipments + 1),
+        "Latitude": np.round(STORE[0] + north / km_per_deg_lat, 6),
+        "Longitude": np.round(STORE[1] + east / km_per_deg_lon, 6),
+        "Delivery Timeslot": np.asarray(slots)[rng.choice(len(slots), size=n_shipments,
+                                                          p=probabilities / probabilities.sum())],
+    })
+    vehicles = pd.DataFrame({
+        "Vehicle Type": [vehicle_type for vehicle_type, _, _, _ in FLEET],
+        "Number": [max(1, per_1k * n_shipments // 1_000) if per_1k != "Any" else "Any"
+                   for _, per_1k, _, _ in FLEET],
+        "Shipments_Capacity": [capacity for _, _, capacity, _ in FLEET],
+        "Max Trip Radius (in KM)": [radius for _, _, _, radius in FLEET],
+    })
+    store = pd.DataFrame({"Latitute": [STORE[0]], "Longitude": [STORE[1]]})
+    return {SHIPMENTS_SHEET: shipments, VEHICLES_SHEET: vehicles, STORE_SHEET: store}
+
+
+def write_scenario(scenario, path):
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        for sheet, frame in scenario.items():
+            frame.to_excel(writer, sheet_name=sheet, index=False)
+    return path
+
+
+class StageRecorder:
+    """Wall time and peak memory per named stage.
+
+    ``memory='rss'`` samples resident set size from /proc on a background
+    thread (Linux; no effect on the timed code); ``'tracemalloc'`` traces
+    Python allocations exactly but slows pure-Python stages noticeably.
+    """
+
+    def __init__(self, memory='rss', interval=0.005):
+        if memory == 'rss' and not os.path.exists('/proc/self/statm'):
+            memory = 'tracemalloc'
+        self.memory = memory
+        self.interval = interval
+        self.stages = {}
+
+    @staticmethod
+    def _rss():
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    def run(self, name, func, *args, **kwargs):
+        if self.memory == 'tracemalloc':
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = 0
+        else:
+            baseline = self._rss()
+            peak = [baseline]
+            done = threading.Event()
+
+            def sample():
+                while not done.wait(self.interval):
+                    peak[0] = max(peak[0], self._rss())
+
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            if self.memory == 'tracemalloc':
+                used = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                done.set()
+                sampler.join()
+                used = max(peak[0], self._rss()) - baseline
+            self.stages[name] = {'seconds': round(seconds, 4), 'peak_mb': round(used / 2**20, 2)}
+
+
+def run_scenario(n_shipments, distribution='clustered', method='grid', seed=42, workdir=None,
+                 use_workbook=True, render=True, predictions=1_000, memory='rss'):
+    """Run every pipeline stage on one generated scenario and return its measurements."""
+    from algo import SmartRouteOptimizer
+
+    workdir = workdir or tempfile.mkdtemp(prefix="smartroute-bench-")
+    scenario = generate_scenario(n_shipments, distribution, seed)
+    optimizer = SmartRouteOptimizer(logging_level=logging.WARNING)
+    recorder = StageRecorder(memory)
+
+    if use_workbook:
+        # The workbook is generated once per scenario; loading it is what gets timed.
+        # Reruns in the same workdir measure the warm (snapshot) path.
+        workbook = os.path.join(workdir, f"bench_{distribution}_{n_shipments}_{seed}.xlsx")
+        if not os.path.exists(workbook):
+            write_scenario(scenario, workbook)
+        recorder.run('load', optimizer.load_data, workbook)
+    else:
+        recorder.run('load', optimizer.load_records, scenario[SHIPMENTS_SHEET],
+                     scenario[VEHICLES_SHEET], scenario[STORE_SHEET])
+
+    recorder.run('preprocess', optimizer.preprocess_data)
+    recorder.run('cluster', optimizer._label_clusters, method)
+    trips = recorder.run('assign', optimizer._build_trips)
+    result = recorder.run('expand', optimizer._finalize_trips, trips)
+
+    from data import write_output_data
+    recorder.run('write', write_output_data, result, os.path.join(workdir, "bench_output.xlsx"))
+    if render:
+        recorder.run('render', optimizer.plot_shipments_on_map, result, os.path.join(workdir, "bench_map.html"))
+
+    if predictions:
+        rng = np.random.default_rng(seed + 1)
+        points = generate_scenario(predictions, 'uniform', seed + 1)[SHIPMENTS_SHEET]
+        slots = np.asarray(["9-12", "12-14", "14-17", "7-9"])[rng.integers(0, 4, predictions)]
+        recorder.run('predict', optimizer.predict_vehicle_allocations,
+                     points['Latitude'].to_numpy(), points['Longitude'].to_numpy(), slots.tolist())
+
+    assigned = sum(len(trip['Shipments']) for trip in trips)
+    return {
+        'scenario': {'shipments': n_shipments, 'distribution': distribution, 'method': method, 'seed': seed,
+                     'workbook': use_workbook, 'memory': recorder.memory},
+        'counts': {'clusters': int(optimizer.processed_shipments['Cluster'].nunique()), 'trips': len(trips),
+                   'assigned': assigned, 'dropped': len(optimizer.processed_shipments) - assigned,
+                   'rows': len(result)},
+        'stages': recorder.stages,
+    }
+
+
+def scenario_key(run):
+    scenario = run['scenario']
+    return f"{scenario['distribution']}/{scenario['method']}/{scenario['shipments']}"
+
+
+def compare_to_baseline(runs, baseline, tolerance=0.25, min_seconds=0.05, min_mb=1.0):
+    """Stages that got slower or hungrier than the baseline by more than ``tolerance``.
+
+    Differences under ``min_seconds`` / ``min_mb`` are treated as noise.
+    """
+    previous = {scenario_key(run): run for run in baseline.get('runs', [])}
+    regressions = []
+    for run in runs:
+        old = previous.get(scenario_key(run))
+        if old is None:
+            continue
+        for stage, current in run['stages'].items():
+            reference = old['stages'].get(stage)
+            if reference is None:
+                continue
+            for metric, floor in (('seconds', min_seconds), ('peak_mb', min_mb)):
+                if current[metric] - reference[metric] > max(floor, reference[metric] * tolerance):
+                    regressions.append({'scenario': scenario_key(run), 'stage': stage, 'metric': metric,
+                                        'baseline': reference[metric], 'current': current[metric]})
+    return regressions
+
+
+def import_cost(module, repeats=3):
+    """Best-of-``repeats`` cold import of ``module`` in a fresh interpreter: (seconds, lazy backends loaded)."""
+    code = (f"import json, sys, time; start = time.perf_counter(); import {module}; "
+            f"seconds = time.perf_counter() - start; "
+            f"print(json.dumps([seconds, sorted({{name.split('.')[0] for name in sys.modules}} & {set(LAZY_BACKENDS)!r})]))")
+    best, loaded = float('inf'), []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+        seconds, loaded = json.loads(output.splitlines()[-1])
+        best = min(best, seconds)
+    return best, loaded
+
+
+def check_imports(budgets=IMPORT_BUDGETS, scale=1.0):
+    """Cold import measurements, plus a regression for every module over budget or loading a lazy backend."""
+    imports, regressions = {}, []
+    for module, budget in budgets.items():
+        seconds, loaded = import_cost(module)
+        imports[module] = {'seconds': round(seconds, 4), 'budget': budget * scale, 'eager_backends': loaded}
+        if seconds > budget * scale:
+            regressions.append({'scenario': 'import', 'stage': module, 'metric': 'seconds',
+                                'baseline': budget * scale, 'current': round(seconds, 4)})
+        for backend in loaded:
+            regressions.append({'scenario': 'import', 'stage': module, 'metric': 'eager_import',
+                                'baseline': None, 'current': backend})
+    return imports, regressions
+
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartRoute pipeline benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--distributions', nargs='+', default=['clustered', 'uniform'],
+                        choices=['clustered', 'uniform'])
+    parser.add_argument('--method', default='grid', choices=['grid', 'kmeans'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', help="keep generated workbooks here between runs")
+    parser.add_argument('--records', action='store_true', help="load from in-memory frames instead of xlsx")
+    parser.add_argument('--no-render', action='store_true')
+    parser.add_argument('--memory', default='rss', choices=['rss', 'tracemalloc'])
+    parser.add_argument('--out', help="write results JSON here (default: stdout)")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--import-budget-scale', type=float, default=1.0,
+                        help="multiply the cold-start import budgets (slow CI machines)")
+    parser.add_argument('--imports-only', action='store_true', help="only check cold-start import budgets")
+    args = parser.parse_args(argv)
+
+    imports, import_regressions = check_imports(scale=args.import_budget_scale)
+    for module, measured in imports.items():
+        print(f"import {module:<22} {measured['seconds']:.3f}s (budget {measured['budget']:.2f}s)", file=sys.stderr)
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+    runs = []
+    for distribution in args.distributions if not args.imports_only else []:
+        for size in args.sizes:
+            run = run_scenario(size, distribution, args.method, args.seed, args.workdir,
+                               use_workbook=not args.records, render=not args.no_render, memory=args.memory)
+            runs.append(run)
+            timings = "  ".join(f"{stage} {m['seconds']:.3f}s/{m['peak_mb']:.0f}MB" for stage, m in run['stages'].items())
+            print(f"{scenario_key(run):<28} {timings}", file=sys.stderr)
+
+    results = {'environment': environment(), 'imports': imports, 'runs': runs, 'regressions': import_regressions}
+    if runs and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            results['regressions'] += compare_to_baseline(runs, json.load(f), args.tolerance)
+    for regression in results['regressions']:
+        print(f"❌ Regression in {regression['scenario']} {regression['stage']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(output)
+        print(f"✅ Baseline saved to {args.baseline}", file=sys.stderr)
+    return 1 if results['regressions'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
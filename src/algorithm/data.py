@@ -1,7 +1,13 @@
 import pandas as pd
+import numpy as np
+import hashlib
+import json
 import os
-import folium
-import matplotlib.pyplot as plt
+import re
+import shutil
+import tempfile
+from metrics import CACHE_REQUESTS
+from trip_result import TripResult
 
 # Set up file paths for input and output
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,71 +15,264 @@ DATA_FOLDER = os.path.join(BASE_DIR, "../../data")
 INPUT_FILE = os.path.join(DATA_FOLDER, "SmartRoute Optimizer.xlsx")
 OUT_FILE = os.path.join(DATA_FOLDER, "Sample Output Trip.xlsx")
 
-def read_Shipment_data():
-    """Load shipment data from the Excel file."""
+SHIPMENTS_SHEET = "Shipments_Data"
+VEHICLES_SHEET = "Vehicle_Information"
+STORE_SHEET = "Store Location"
+
+# Parsed workbooks kept for the life of the process, keyed by path + mtime/size
+_workbook_cache = {}
+# Bump when the snapshot layout changes (2: mixed-type columns keep their values' types)
+SNAPSHOT_VERSION = 2
+# Element kinds of a mixed object column, stored per row
+MIXED_STR, MIXED_INT, MIXED_FLOAT, MIXED_MISSING = 0, 1, 2, 3
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_path(path, file_hash):
+    """Directory holding the columnar snapshot of ``path`` for a given content hash."""
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, f".{name}.{file_hash[:16]}.v{SNAPSHOT_VERSION}.snapshot")
+
+
+def _remove_stale_snapshots(path, keep):
+    """Delete snapshots of ``path`` other than ``keep`` (older contents or snapshot versions)."""
+    folder, name = os.path.split(os.path.abspath(path))
+    pattern = re.compile(re.escape(f".{name}.") + r'[0-9a-f]{16}(\.v\d+)?\.snapshot')
+    for entry in os.listdir(folder):
+        stale = os.path.join(folder, entry)
+        if pattern.fullmatch(entry) and stale != os.path.abspath(keep):
+            # Readers that already mapped the old files keep them until they close
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def _column_kind(values):
+    """'numeric' (incl. bool/datetime), 'str' or 'mixed' (str/int/float objects); TypeError otherwise."""
+    if (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)
+            or pd.api.types.is_datetime64_dtype(values)):
+        return 'numeric'
+    types = {type(value) for value in values[values.notna()]}
+    if types <= {str}:
+        return 'str'
+    if all(issubclass(t, (str, int, float, np.integer, np.floating)) and not issubclass(t, (bool, np.bool_))
+           for t in types):
+        return 'mixed'
+    raise TypeError(f"column {values.name!r} holds {', '.join(sorted(t.__name__ for t in types))} values")
+
+
+def _write_snapshot(frames, target):
+    """Write each sheet as one .npy file per column, then publish the directory atomically."""
+    parent = os.path.dirname(target)
+    tmp_dir = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+    try:
+        os.chmod(tmp_dir, 0o755)
+        meta = {'sheets': []}
+        for s_idx, (sheet, df) in enumerate(frames.items()):
+            columns = []
+            for c_idx, col in enumerate(df.columns):
+                values = df[col]
+                prefix = os.path.join(tmp_dir, f"{s_idx}_{c_idx}")
+                kind = _column_kind(values)
+                if kind == 'numeric':
+                    array = values.to_numpy()
+                elif kind == 'str':
+                    array = values.astype(str).to_numpy(dtype=str)
+                    missing = values.isna().to_numpy()
+                    if missing.any():
+                        np.save(f"{prefix}.mask.npy", missing)
+                else:
+                    # Text and numbers side by side, with each row's kind to pick between them
+                    objects = values.to_numpy(dtype=object)
+                    kinds = np.full(len(objects), MIXED_STR, dtype=np.int8)
+                    kinds[[isinstance(v, (int, np.integer)) for v in objects]] = MIXED_INT
+                    kinds[[isinstance(v, (float, np.floating)) for v in objects]] = MIXED_FLOAT
+                    kinds[values.isna().to_numpy()] = MIXED_MISSING
+                    array = np.where(kinds == MIXED_STR, objects, '').astype(str)
+                    np.save(f"{prefix}.kinds.npy", kinds)
+                    np.save(f"{prefix}.ints.npy", np.where(kinds == MIXED_INT, objects, 0).astype(np.int64))
+                    np.save(f"{prefix}.floats.npy", np.where(kinds == MIXED_FLOAT, objects, np.nan).astype(np.float64))
+                np.save(f"{prefix}.npy", array)
+                columns.append({'name': str(col), 'kind': kind, 'dtype': str(values.dtype)})
+            meta['sheets'].append({'name': sheet, 'columns': columns})
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        os.rename(tmp_dir, target)
+    except OSError:
+        # Another process published the same snapshot first, or the folder is read-only
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(target):
+            raise
+
+
+def _read_snapshot(target):
+    """Memory-map a snapshot written by _write_snapshot back into DataFrames with the original dtypes."""
+    with open(os.path.join(target, 'meta.json')) as f:
+        meta = json.load(f)
+
+    frames = {}
+    for s_idx, sheet in enumerate(meta['sheets']):
+        data = {}
+        for c_idx, column in enumerate(sheet['columns']):
+            prefix = os.path.join(target, f"{s_idx}_{c_idx}")
+            values = np.load(f"{prefix}.npy", mmap_mode='r')
+            if column['kind'] == 'str':
+                values = pd.Series(values, dtype=object)
+                if os.path.exists(f"{prefix}.mask.npy"):
+                    values[np.load(f"{prefix}.mask.npy")] = np.nan
+            elif column['kind'] == 'mixed':
+                kinds = np.load(f"{prefix}.kinds.npy")
+                objects = values.astype(object)
+                objects[kinds == MIXED_INT] = np.load(f"{prefix}.ints.npy")[kinds == MIXED_INT].tolist()
+                objects[kinds == MIXED_FLOAT] = np.load(f"{prefix}.floats.npy")[kinds == MIXED_FLOAT].tolist()
+                objects[kinds == MIXED_MISSING] = np.nan
+                values = pd.Series(objects, dtype=object)
+            if column['kind'] != 'numeric' and column['dtype'] != 'object':
+                # e.g. pandas string or category columns
+                values = values.astype(column['dtype'])
+            data[column['name']] = values
+        frames[sheet['name']] = pd.DataFrame(data, copy=False)
+    return frames
+
+
+def load_workbook(path=INPUT_FILE, use_snapshot=True):
+    """Parse every sheet of the input workbook once.
+
+    The first load writes a typed columnar snapshot next to the workbook,
+    keyed by its content hash; later loads memory-map that snapshot and skip
+    Excel parsing entirely. Publishing a snapshot removes the ones left by
+    earlier contents of the same workbook.
+    """
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    frames = _workbook_cache.get(cache_key)
+    CACHE_REQUESTS.inc(cache='workbook', result='miss' if frames is None else 'hit')
+
+    if frames is None:
+        target = snapshot_path(path, _file_hash(path)) if use_snapshot else None
+        if target and os.path.isdir(target):
+            frames = _read_snapshot(target)
+            print(f"✅ Loaded workbook snapshot {os.path.basename(target)}")
+        else:
+            frames = pd.read_excel(path, sheet_name=None)
+            print(f"✅ Parsed {len(frames)} sheets from {path}")
+            if target:
+                try:
+                    _write_snapshot(frames, target)
+                    _remove_stale_snapshots(path, target)
+                except Exception as e:
+                    print(f"❌ Could not write workbook snapshot: {e}")
+        _workbook_cache.clear()
+        _workbook_cache[cache_key] = frames
+
+    # Shallow copies so callers can rename or drop columns freely
+    return {sheet: df.copy(deep=False) for sheet, df in frames.items()}
+
+
+def _read_sheet(sheet_name):
     try:
-        # Load the Excel file and the 'Shipments_Data' sheet
-        xls = pd.ExcelFile(INPUT_FILE)
-        Shipment_data = xls.parse("Shipments_Data")
-        print(f"✅ Loaded 'Shipments_Data' from {INPUT_FILE}")
-        print(Shipment_data.head())  # Print first 5 rows to confirm data
-        return Shipment_data
+        return load_workbook()[sheet_name]
     except Exception as e:
-        print(f"❌ Error reading {INPUT_FILE}: {e}")
+        print(f"❌ Error reading {sheet_name} from {INPUT_FILE}: {e}")
         return None
 
+
+def read_Shipment_data():
+    """Load shipment data from the Excel file."""
+    return _read_sheet(SHIPMENTS_SHEET)
+
+# Payload field names accepted in place of the workbook's column headers
+SHIPMENT_ALIASES = {
+    'shipment_id': 'Shipment ID', 'id': 'Shipment ID',
+    'latitude': 'Latitude', 'lat': 'Latitude',
+    'longitude': 'Longitude', 'lon': 'Longitude', 'lng': 'Longitude',
+    'delivery_timeslot': 'Delivery Timeslot', 'time_slot': 'Delivery Timeslot', 'timeslot': 'Delivery Timeslot',
+}
+VEHICLE_ALIASES = {
+    'vehicle_type': 'Vehicle Type', 'number': 'Number',
+    'shipments_capacity': 'Shipments_Capacity', 'capacity': 'Shipments_Capacity',
+    'max_trip_radius_(in_km)': 'Max Trip Radius (in KM)', 'max_trip_radius': 'Max Trip Radius (in KM)',
+}
+STORE_ALIASES = {'latitude': 'Latitute', 'Latitude': 'Latitute', 'lat': 'Latitute',
+                 'longitude': 'Longitude', 'lon': 'Longitude', 'lng': 'Longitude'}
+
+
+def records_to_frame(records, aliases=None):
+    """Build a DataFrame from in-memory records without touching disk.
+
+    Accepts a DataFrame, a list of dicts, a dict of columns (lists or NumPy
+    arrays), a NumPy structured array, a pyarrow Table, or Arrow IPC stream
+    bytes.
+    """
+    if isinstance(records, pd.DataFrame):
+        frame = records.copy()
+    elif isinstance(records, (bytes, bytearray, memoryview)):
+        try:
+            import pyarrow.ipc
+        except ImportError as e:
+            raise ImportError("Reading Arrow IPC payloads requires pyarrow") from e
+        frame = pyarrow.ipc.open_stream(records).read_all().to_pandas()
+    elif hasattr(records, 'to_pandas'):
+        frame = records.to_pandas()
+    elif isinstance(records, dict) and not any(np.ndim(value) for value in records.values()):
+        # A single record, e.g. the store location
+        frame = pd.DataFrame([records])
+    else:
+        frame = pd.DataFrame(records)
+
+    if aliases:
+        frame = frame.rename(columns={col: aliases[col] for col in frame.columns if col in aliases})
+    return frame
+
+
+def iter_shipment_chunks(path, chunksize=50_000):
+    """Yield shipment DataFrames of at most ``chunksize`` rows from a CSV or Parquet file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.csv', '.gz', '.txt'):
+        yield from pd.read_csv(path, chunksize=chunksize)
+    elif extension in ('.parquet', '.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Streaming Parquet files requires pyarrow") from e
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported shipment file type for streaming: {path}")
+
 def plot_shipment_data_on_map(shipment_data):
-    """Plot shipment data on a Folium map."""
+    """Plot shipment data on a clustered Leaflet map."""
+    from map_render import render_points_map
+
     try:
-        # Initialize the map centered around the mean of latitude and longitude
-        m = folium.Map(location=[shipment_data['Latitude'].mean(), shipment_data['Longitude'].mean()],
-                       zoom_start=12, control_scale=True)
-
-        # Add each shipment as a marker on the map
-        for _, row in shipment_data.iterrows():
-            folium.Marker(
-                location=[row['Latitude'], row['Longitude']],
-                popup=f"Shipment ID: {row['Shipment ID']}<br>Delivery Timeslot: {row['Delivery Timeslot']}",
-                icon=folium.Icon(color='blue', icon='info-sign')
-            ).add_to(m)
-
-        # Save the map as an HTML file
-        m.save(os.path.join(DATA_FOLDER, "shipment_map.html"))
-        print(f"✅ Map saved to {os.path.join(DATA_FOLDER, 'shipment_map.html')}")
+        out_file = os.path.join(DATA_FOLDER, "shipment_map.html")
+        render_points_map(shipment_data, out_file)
+        print(f"✅ Map saved to {out_file}")
     except Exception as e:
         print(f"❌ Error plotting data on map: {e}")
 
 def read_Vehical_Information():
-    sheet_name='Vehicle_Information'
     """Read the vehicle information from the specified sheet."""
-    try:
-        xls = pd.ExcelFile(INPUT_FILE)
-        Vehical_Information = xls.parse(sheet_name)
-        print(f"✅ Loaded {sheet_name} from {INPUT_FILE}")
-        print(Vehical_Information.head())  
-        return Vehical_Information
-    except Exception as e:
-        print(f"❌ Error reading {INPUT_FILE}: {e}")
-        return None
+    return _read_sheet(VEHICLES_SHEET)
 
 def read_Store_Location():
-    sheet_name='Store Location'
     """Read store location data from the specified sheet."""
+    return _read_sheet(STORE_SHEET)
+
+def write_output_data(data, path=OUT_FILE):
+    """Write trips (a DataFrame or TripResult, in the legacy flat layout) to the output Excel file."""
     try:
-        xls = pd.ExcelFile(INPUT_FILE)
-        Store_Location = xls.parse(sheet_name)
-        print(f"✅ Loaded {sheet_name} from {INPUT_FILE}")
-        print(Store_Location.head()) 
-        return Store_Location
-    except Exception as e:
-        print(f"❌ Error reading {INPUT_FILE}: {e}")
-        return None
-def write_output_data(data):
-    """Write the trips DataFrame to the output Excel file."""
-    try:
-        with pd.ExcelWriter(OUT_FILE, engine='xlsxwriter') as writer:
+        if isinstance(data, TripResult):
+            data = data.to_legacy()
+        with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
             data.to_excel(writer, sheet_name='Sample Output Trip', index=False)
-            print(f"✅ Output data written to {OUT_FILE}")
+            print(f"✅ Output data written to {path}")
     except Exception as e:
         print(f"❌ Error writing output data: {e}")
         
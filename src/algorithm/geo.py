@@ -0,0 +1,102 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def _radians(values, dtype):
+    return np.radians(np.asarray(values, dtype=dtype))
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km for broadcastable radian arrays."""
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    # Rounding can push a fraction of an ulp above 1 for antipodal points
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def haversine(lat1, lon1, lat2, lon2, dtype=np.float64):
+    """Element-wise haversine distance (km); inputs may be scalars or equal-length arrays."""
+    return _haversine(_radians(lat1, dtype), _radians(lon1, dtype),
+                      _radians(lat2, dtype), _radians(lon2, dtype))
+
+
+def haversine_one_to_many(lat, lon, lats, lons, dtype=np.float64):
+    """Distances (km) from a single point to every point in ``lats``/``lons``."""
+    return haversine(lat, lon, lats, lons, dtype=dtype)
+
+
+def haversine_many_to_many(lats1, lons1, lats2, lons2, dtype=np.float64):
+    """Full (len(lats1), len(lats2)) distance matrix in km."""
+    lat1 = _radians(lats1, dtype)[:, None]
+    lon1 = _radians(lons1, dtype)[:, None]
+    lat2 = _radians(lats2, dtype)[None, :]
+    lon2 = _radians(lons2, dtype)[None, :]
+    return _haversine(lat1, lon1, lat2, lon2)
+
+
+def haversine_chunked(lats1, lons1, lats2, lons2, max_bytes=64 * 2**20, dtype=np.float64):
+    """Yield ``(row_start, block)`` slices of the many-to-many matrix.
+
+    Each block holds as many rows as fit in ``max_bytes`` (at least one), so
+    callers can reduce huge matrices without materialising them.
+    """
+    lats1 = np.asarray(lats1)
+    lons1 = np.asarray(lons1)
+    n_cols = max(1, len(lats2))
+    # The kernel keeps a handful of temporaries alive per element
+    bytes_per_row = n_cols * np.dtype(dtype).itemsize * 4
+    rows = max(1, int(max_bytes // bytes_per_row))
+    for start in range(0, len(lats1), rows):
+        stop = start + rows
+        yield start, haversine_many_to_many(lats1[start:stop], lons1[start:stop], lats2, lons2, dtype=dtype)
+
+
+def nearest(lats1, lons1, lats2, lons2, max_bytes=64 * 2**20, dtype=np.float64):
+    """Index of, and distance to, the nearest ``lats2``/``lons2`` point for each query point."""
+    index = np.empty(len(lats1), dtype=np.intp)
+    distance = np.empty(len(lats1), dtype=dtype)
+    for start, block in haversine_chunked(lats1, lons1, lats2, lons2, max_bytes=max_bytes, dtype=dtype):
+        stop = start + len(block)
+        index[start:stop] = block.argmin(axis=1)
+        distance[start:stop] = block[np.arange(len(block)), index[start:stop]]
+    return index, distance
+
+
+def benchmark(n=100_000, n_centers=2_000, repeat=3, seed=42):
+    """Compare the scalar per-row path with the batched kernels."""
+    import time
+
+    rng = np.random.default_rng(seed)
+    lats = 19.0 + rng.random(n) * 0.3
+    lons = 72.8 + rng.random(n) * 0.3
+    store_lat, store_lon = 19.075887, 72.877911
+
+    def scalar():
+        # Mirrors the old iterrows()/list-comprehension call pattern
+        return [float(haversine(store_lat, store_lon, lat, lon)) for lat, lon in zip(lats, lons)]
+
+    def timed(fn):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    results = {
+        'scalar one-to-many': timed(scalar),
+        'one-to-many float64': timed(lambda: haversine_one_to_many(store_lat, store_lon, lats, lons)),
+        'one-to-many float32': timed(lambda: haversine_one_to_many(store_lat, store_lon, lats, lons, dtype=np.float32)),
+        f'nearest of {n_centers} float64': timed(lambda: nearest(lats, lons, lats[:n_centers], lons[:n_centers])),
+        f'nearest of {n_centers} float32': timed(
+            lambda: nearest(lats, lons, lats[:n_centers], lons[:n_centers], dtype=np.float32)),
+    }
+    for name, seconds in results.items():
+        print(f"{name:<28} {seconds * 1000:10.2f} ms  ({n} points)")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
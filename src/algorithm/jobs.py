@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    def __init__(self, job_id, key, stages):
+        self.id = job_id
+        self.key = key
+        self.stages = list(stages)
+        self.state = 'queued'
+        self.stage = None
+        self.stage_times = {}
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        done = len(self.stage_times) if self.state != 'done' else len(self.stages)
+        return {
+            'job_id': self.id,
+            'state': self.state,
+            'stage': self.stage,
+            'progress': round(done / len(self.stages), 2) if self.stages else 1.0,
+            'stage_times': {stage: round(seconds, 3) for stage, seconds in self.stage_times.items()},
+            'submitted_at': self.submitted_at,
+            'finished_at': self.finished_at,
+            'error': self.error
+        }
+
+
+class JobManager:
+    """Runs optimization jobs on a background worker pool.
+
+    ``runner(payload, progress)`` does the work and calls ``progress(stage)``
+    as it enters each stage. Identical payloads submitted while a job is
+    queued or running share that job; finished jobs are kept in a bounded
+    store and the oldest are evicted first.
+    """
+
+    def __init__(self, runner, stages, max_workers=2, max_finished=32):
+        self.logger = logging.getLogger(__name__)
+        self.runner = runner
+        self.stages = stages
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="optimize-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+
+    @staticmethod
+    def payload_key(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def submit(self, payload):
+        """Queue a job (or join an identical in-flight one) and return its id."""
+        key = self.payload_key(payload)
+        with self._lock:
+            job_id = self._in_flight.get(key)
+            if job_id is not None:
+                return job_id
+            job = Job(uuid.uuid4().hex, key, self.stages)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+        self._pool.submit(self._run, job, payload)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, payload):
+        started = {}
+
+        def progress(stage):
+            now = time.perf_counter()
+            if job.stage is not None:
+                job.stage_times[job.stage] = now - started[job.stage]
+            job.stage = stage
+            started[stage] = now
+
+        job.state = 'running'
+        try:
+            result = self.runner(payload, progress)
+            if job.stage is not None:
+                job.stage_times[job.stage] = time.perf_counter() - started[job.stage]
+            job.result = result
+            job.state = 'done'
+        except Exception as e:
+            self.logger.error(f"Optimization job {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._in_flight.pop(job.key, None)
+                self._evict()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in ('done', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,166 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+VEHICLE_COLORS = {'3W': 'blue', '4W-EV': 'green', '4W': 'red'}
+COORD_DECIMALS = 6
+
+# Leaflet page that loads its features from a separate (cacheable) JSON file
+# and clusters stop markers on the client.
+MAP_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8" />
+<title>{title}</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0" />
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css" />
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet.markercluster@1.5.3/dist/MarkerCluster.css" />
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet.markercluster@1.5.3/dist/MarkerCluster.Default.css" />
+<script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js"></script>
+<script src="https://cdn.jsdelivr.net/npm/leaflet.markercluster@1.5.3/dist/leaflet.markercluster.js"></script>
+<style>html, body, #map {{width: 100%; height: 100%; margin: 0; padding: 0;}}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var map = L.map('map').setView([{center_lat}, {center_lon}], {zoom});
+L.tileLayer('https://tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{
+  maxZoom: 19, attribution: '&copy; OpenStreetMap contributors'
+}}).addTo(map);
+fetch('{data_url}').then(function (r) {{ return r.json(); }}).then(function (data) {{
+  if (data.store) {{
+    L.marker(data.store).bindPopup('Store Location').addTo(map);
+  }}
+  var overlays = {{}};
+  Object.keys(data.layers).forEach(function (name) {{
+    var layer = data.layers[name];
+    var color = layer.color || 'gray';
+    var group = L.layerGroup();
+    var clusters = L.markerClusterGroup({{chunkedLoading: true}});
+    L.geoJSON(layer.features, {{
+      filter: function (f) {{ return f.geometry.type === 'LineString'; }},
+      style: {{color: color, weight: 4, opacity: 0.7}}
+    }}).addTo(group);
+    L.geoJSON(layer.features, {{
+      filter: function (f) {{ return f.geometry.type === 'Point'; }},
+      pointToLayer: function (f, latlng) {{
+        return L.circleMarker(latlng, {{radius: 5, color: color, fillOpacity: 0.8}});
+      }},
+      onEachFeature: function (f, l) {{
+        var p = f.properties;
+        l.bindPopup(Object.keys(p).map(function (k) {{ return k + ': ' + p[k]; }}).join('<br>'));
+      }}
+    }}).addTo(clusters);
+    clusters.addTo(group);
+    group.addTo(map);
+    overlays[name] = group;
+  }});
+  L.control.layers(null, overlays, {{collapsed: false}}).addTo(map);
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def _round(values):
+    return np.round(np.asarray(values, dtype=np.float64), COORD_DECIMALS).tolist()
+
+
+def _point_features(lats, lons, properties):
+    """Point features; ``properties`` maps a property name to a per-point sequence."""
+    names = list(properties)
+    columns = [list(properties[name]) for name in names]
+    return [
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+         'properties': dict(zip(names, values))}
+        for lat, lon, *values in zip(_round(lats), _round(lons), *columns)
+    ]
+
+
+def trip_layers(flat_trips, store_lat, store_lon, coords=None):
+    """GeoJSON FeatureCollection per vehicle type: one LineString per trip plus its stops.
+
+    ``flat_trips`` has one row per shipment (TRIP_ID, Shipment_ID,
+    Vehicle_Type and optionally STOP_SEQ). Coordinates come from the rows
+    themselves or, if ``coords`` (indexed by shipment ID) is given, from a
+    single indexed join.
+    """
+    trips = flat_trips
+    if coords is not None:
+        joined = coords.reindex(trips['Shipment_ID'].to_numpy())
+        trips = trips.assign(Latitude=joined['Latitude'].to_numpy(), Longitude=joined['Longitude'].to_numpy())
+    trips = trips.dropna(subset=['Latitude', 'Longitude'])
+    sort_cols = ['TRIP_ID', 'STOP_SEQ'] if 'STOP_SEQ' in trips.columns else ['TRIP_ID']
+    trips = trips.sort_values(sort_cols, kind='stable')
+
+    store = [round(float(store_lon), COORD_DECIMALS), round(float(store_lat), COORD_DECIMALS)]
+    layers = {}
+    for vehicle_type, vehicle_trips in trips.groupby('Vehicle_Type', sort=True):
+        lats = vehicle_trips['Latitude'].to_numpy()
+        lons = vehicle_trips['Longitude'].to_numpy()
+        trip_ids = vehicle_trips['TRIP_ID'].astype(str).to_numpy()
+        properties = {'trip': trip_ids, 'shipment': vehicle_trips['Shipment_ID'].astype(str).to_numpy()}
+        features = _point_features(lats, lons, properties)
+
+        # Trips are contiguous after sorting, so each route is a slice
+        starts = np.flatnonzero(np.r_[True, trip_ids[1:] != trip_ids[:-1]])
+        ends = np.r_[starts[1:], len(trip_ids)]
+        lon_list, lat_list = _round(lons), _round(lats)
+        for start, end in zip(starts, ends):
+            path = [store] + [[lon, lat] for lon, lat in zip(lon_list[start:end], lat_list[start:end])] + [store]
+            features.append({'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': path},
+                             'properties': {'trip': trip_ids[start], 'vehicle': vehicle_type}})
+
+        layers[str(vehicle_type)] = {'type': 'FeatureCollection', 'color': VEHICLE_COLORS.get(vehicle_type, 'gray'),
+                                     'features': features}
+    return layers
+
+
+def point_layer(shipments, name='Shipments', color='blue'):
+    """Single clustered layer of raw shipments (no routes)."""
+    properties = {'shipment': shipments['Shipment ID'].astype(str).to_numpy()}
+    if 'Delivery Timeslot' in shipments.columns:
+        properties['timeslot'] = shipments['Delivery Timeslot'].astype(str).to_numpy()
+    return {name: {'type': 'FeatureCollection', 'color': color,
+                   'features': _point_features(shipments['Latitude'], shipments['Longitude'], properties)}}
+
+
+def write_map(out_html, layers, center, store=None, zoom=13, title="SmartRoute map"):
+    """Write the map page plus a content-hashed ``<name>.<hash>.json`` data file beside it.
+
+    The hash in the data file name makes it safe to cache indefinitely;
+    older data files for the same page are removed.
+    """
+    payload = json.dumps({'store': list(store) if store is not None else None, 'layers': layers},
+                         separators=(',', ':')).encode()
+    folder = os.path.dirname(os.path.abspath(out_html))
+    stem = os.path.splitext(os.path.basename(out_html))[0]
+    data_name = f"{stem}.{hashlib.sha256(payload).hexdigest()[:12]}.json"
+    data_path = os.path.join(folder, data_name)
+
+    for old in glob.glob(os.path.join(folder, glob.escape(stem) + '.*.json')):
+        if os.path.basename(old) != data_name:
+            os.remove(old)
+    if not os.path.exists(data_path):
+        with open(data_path, 'wb') as f:
+            f.write(payload)
+
+    with open(out_html, 'w', encoding='utf-8') as f:
+        f.write(MAP_TEMPLATE.format(title=title, center_lat=float(center[0]), center_lon=float(center[1]),
+                                    zoom=zoom, data_url=data_name))
+    return data_path
+
+
+def render_trip_map(flat_trips, store_lat, store_lon, out_html, coords=None):
+    layers = trip_layers(flat_trips, store_lat, store_lon, coords=coords)
+    return write_map(out_html, layers, center=(store_lat, store_lon), store=(store_lat, store_lon),
+                     title="Optimized routes")
+
+
+def render_points_map(shipments, out_html):
+    center = (shipments['Latitude'].mean(), shipments['Longitude'].mean())
+    return write_map(out_html, point_layer(shipments), center=center, zoom=12, title="Shipments")
@@ -0,0 +1,159 @@
+import bisect
+import cProfile
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans a cached prediction up to a large optimization
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus exposition layout."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._series[key] = (counts, total + value)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ('le',)
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{_label_text(names, key + (le,))} {cumulative}")
+                labels = _label_text(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram('smartroute_stage_duration_seconds', 'Optimizer stage latency.', ['stage'])
+STAGE_ROWS = Counter('smartroute_stage_rows_total', 'Rows processed per optimizer stage.', ['stage'])
+CLUSTERS = Counter('smartroute_clusters_total', 'Clusters produced by the optimizer.')
+DROPPED_CLUSTERS = Counter('smartroute_dropped_clusters_total', 'Clusters left without a trip because no vehicle fit.')
+DROPPED_SHIPMENTS = Counter('smartroute_dropped_shipments_total', 'Shipments in clusters no vehicle fit.')
+CACHE_REQUESTS = Counter('smartroute_cache_requests_total', 'Cache lookups by cache and result.', ['cache', 'result'])
+HTTP_SECONDS = Histogram('smartroute_http_request_duration_seconds', 'Flask request latency.',
+                         ['endpoint', 'method', 'status'])
+REGISTRY = [STAGE_SECONDS, STAGE_ROWS, CLUSTERS, DROPPED_CLUSTERS, DROPPED_SHIPMENTS, CACHE_REQUESTS, HTTP_SECONDS]
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    return '\n'.join(line for metric in REGISTRY for line in metric.collect()) + '\n'
+
+
+@contextmanager
+def stage_timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(stage):
+    """Decorator recording a method's latency under ``stage``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SlowRequestProfiler:
+    """Opt-in cProfile of each request, kept only when it runs longer than ``threshold_ms``.
+
+    Enabled by setting SMARTROUTE_PROFILE_SLOW_MS; profiles are written as
+    ``<timestamp>_<name>.prof`` into ``out_dir`` for snakeviz/pstats.
+    """
+
+    def __init__(self, threshold_ms=None, out_dir='profiles'):
+        if threshold_ms is None and os.environ.get('SMARTROUTE_PROFILE_SLOW_MS'):
+            threshold_ms = float(os.environ['SMARTROUTE_PROFILE_SLOW_MS'])
+        self.threshold_ms = threshold_ms
+        self.out_dir = out_dir
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.threshold_ms is not None
+
+    def start(self):
+        if not self.enabled:
+            return
+        profiler = cProfile.Profile()
+        self._local.profiler = profiler
+        self._local.started = time.perf_counter()
+        profiler.enable()
+
+    def stop(self, name):
+        """Stop this thread's profile; return the dump path if the call was slow."""
+        profiler = getattr(self._local, 'profiler', None)
+        if profiler is None:
+            return None
+        profiler.disable()
+        self._local.profiler = None
+        elapsed_ms = (time.perf_counter() - self._local.started) * 1000
+        if elapsed_ms < self.threshold_ms:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{safe_name}_{int(elapsed_ms)}ms.prof")
+        profiler.dump_stats(path)
+        return path
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import threading
+
+from algo import SmartRouteOptimizer
+from data import INPUT_FILE
+from serving_snapshot import SnapshotReader, publish
+
+
+class OptimizerService:
+    """Process-wide holder for a warm SmartRouteOptimizer.
+
+    The model is built when the service starts (on first use unless
+    ``start`` is called earlier) and swapped atomically when the input
+    workbook changes, so later requests never wait on Excel parsing or
+    clustering.
+
+    With ``snapshot_dir`` set, several worker processes share one model: the
+    process holding the builder lock fits and publishes versioned snapshots
+    there, and every other process memory-maps the current version instead
+    of fitting its own. A reader takes over building if the builder exits.
+    """
+
+    def __init__(self, input_file=INPUT_FILE, poll_interval=5.0, snapshot_dir=None):
+        self.logger = logging.getLogger(__name__)
+        self.input_file = input_file
+        self.poll_interval = poll_interval
+        self.snapshot_dir = snapshot_dir
+        self.is_builder = snapshot_dir is None
+        self._reader = SnapshotReader(snapshot_dir) if snapshot_dir else None
+        self._builder_lock = None
+
+        self._optimizer = None
+        self._fingerprint = None
+        self._content_hash = None
+        self._build_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    @property
+    def optimizer(self):
+        """Current ready-to-serve optimizer (never a half-built one)."""
+        if self._watcher is None:
+            with self._start_lock:
+                if self._watcher is None:
+                    self.start()
+        if not self.is_builder:
+            return self._reader.current()
+        if self._optimizer is None:
+            self.refresh()
+        return self._optimizer
+
+    def start(self):
+        """Start watching the workbook for changes and build the model now."""
+        if self.snapshot_dir:
+            self.is_builder = self._claim_builder()
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="optimizer-watcher", daemon=True)
+            self._watcher.start()
+        if self.is_builder:
+            self.refresh(force=True)
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self, force=False):
+        """Rebuild the model if the workbook content changed. Returns True if swapped."""
+        with self._build_lock:
+            fingerprint = self._stat_fingerprint()
+            if not force and fingerprint == self._fingerprint:
+                return False
+
+            # mtime/size changed: only rebuild if the bytes really differ
+            content_hash = self._hash_file()
+            if not force and content_hash == self._content_hash:
+                self._fingerprint = fingerprint
+                return False
+
+            optimizer = self._build()
+            if self.snapshot_dir:
+                version = publish(optimizer, self.snapshot_dir, tag=content_hash[:12])
+                self.logger.info(f"Published serving snapshot {version}")
+            self._optimizer = optimizer
+            self._fingerprint = fingerprint
+            self._content_hash = content_hash
+            self.logger.info(f"Optimizer model ready (workbook {content_hash[:12]})")
+            return True
+
+    def _build(self):
+        optimizer = SmartRouteOptimizer()
+        optimizer.load_data().preprocess_data()
+        optimizer.optimize_trips()
+        return optimizer
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                if not self.is_builder:
+                    if not self._claim_builder():
+                        continue
+                    self.is_builder = True
+                    self.logger.info("Took over as serving snapshot builder")
+                    self.refresh(force=True)
+                    continue
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous model if the new workbook is broken
+                self.logger.error(f"Optimizer rebuild failed: {e}")
+
+    def _claim_builder(self):
+        """Try to take the cross-process builder lock; held for the life of the process."""
+        try:
+            import fcntl
+        except ImportError:
+            return True  # no flock (Windows): every process builds for itself
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.snapshot_dir, '.builder.lock'), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._builder_lock = lock_file
+        return True
+
+    def _stat_fingerprint(self):
+        stat = os.stat(self.input_file)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _hash_file(self):
+        digest = hashlib.sha256()
+        with open(self.input_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from fleet import split_counts
+from partition import morton_codes
+from result_cache import OPTIMIZER_CONSTANTS
+
+# Column layout of the shared coordinate block
+SHARED_COLUMNS = ['Position', 'Latitude', 'Longitude', 'Distance', 'Time Slot Start', 'Time Slot End']
+
+
+def partition_keys(processed_shipments, region_level=0):
+    """(slot start, slot end, spatial tile) key per shipment."""
+    keys = processed_shipments[['Time Slot Start', 'Time Slot End']].copy()
+    keys['Region'] = 0
+    if region_level > 0:
+        codes = morton_codes(processed_shipments['Latitude'].to_numpy(),
+                             processed_shipments['Longitude'].to_numpy())
+        keys['Region'] = (codes >> (32 - 2 * region_level)).astype(np.int64)
+    return keys
+
+
+def to_shared_memory(block):
+    """Copy a 2-D float64 array into a new shared-memory segment."""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, block.nbytes))
+    np.ndarray(block.shape, dtype=block.dtype, buffer=shm.buf)[:] = block
+    return shm
+
+
+def _solve_partition(shm_name, shape, lo, hi, config, method, engine):
+    """Worker: solve rows [lo, hi) of the shared block and return (positions, labels, trips)."""
+    from algo import SmartRouteOptimizer
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[lo:hi]
+        part = pd.DataFrame(block, columns=SHARED_COLUMNS)
+        positions = part['Position'].to_numpy(dtype=np.int64)
+        # Positions stand in for shipment IDs inside the worker
+        part['Shipment ID'] = positions
+        part['Time Slot Start'] = part['Time Slot Start'].astype(int)
+        part['Time Slot End'] = part['Time Slot End'].astype(int)
+        part = part.drop(columns='Position')
+    finally:
+        del block
+        shm.close()
+
+    optimizer = SmartRouteOptimizer(logging_level=config.pop('logging_level'))
+    optimizer.__dict__.update(config)
+    optimizer.processed_shipments = part
+    trips = optimizer._solve(method, engine)
+    return positions, optimizer.processed_shipments['Cluster'].to_numpy(), trips
+
+
+def solve_partitions(optimizer, method='kmeans', engine='cluster', region_level=0, workers=None):
+    """Solve each timeslot/region partition concurrently and merge the trips.
+
+    Coordinates, distances and slots are placed once in shared memory; each
+    worker reads only its contiguous slice. Partitions are merged in key
+    order with cluster ids offset by partition, so the result does not
+    depend on worker scheduling.
+    """
+    trips = []
+    for part_trips in iter_partitions(optimizer, method, engine, region_level, workers):
+        trips.extend(part_trips)
+    return trips
+
+
+def iter_partitions(optimizer, method='kmeans', engine='cluster', region_level=0, workers=None):
+    """Like solve_partitions, but yield each partition's merged trips as soon as it is done.
+
+    Partitions come out in key order; cluster labels are written to
+    processed_shipments once the last one has been yielded.
+    """
+    shipments = optimizer.processed_shipments
+    keys = partition_keys(shipments, region_level)
+    order = np.lexsort((keys['Region'].to_numpy(), keys['Time Slot End'].to_numpy(),
+                        keys['Time Slot Start'].to_numpy()))
+    sorted_keys = keys.to_numpy()[order]
+    boundaries = np.flatnonzero(np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)) + 1
+    ranges = list(zip(np.concatenate([[0], boundaries]), np.concatenate([boundaries, [len(order)]])))
+
+    block = np.column_stack([
+        order.astype(np.float64),
+        shipments['Latitude'].to_numpy(dtype=np.float64)[order],
+        shipments['Longitude'].to_numpy(dtype=np.float64)[order],
+        shipments['Distance'].to_numpy(dtype=np.float64)[order],
+        shipments['Time Slot Start'].to_numpy(dtype=np.float64)[order],
+        shipments['Time Slot End'].to_numpy(dtype=np.float64)[order],
+    ])
+    config = {
+        'logging_level': optimizer.logger.getEffectiveLevel(),
+        'vehicles': optimizer.vehicles,
+        'priority_vehicles': optimizer.priority_vehicles,
+        'store': optimizer.store,
+        'distance_provider': optimizer.distance_provider,
+        **{name: getattr(optimizer, name) for name in OPTIMIZER_CONSTANTS},
+    }
+
+    shipment_ids = shipments['Shipment ID'].to_numpy()
+    cluster_labels = np.empty(len(shipments), dtype=np.int64)
+    offset = 0
+    shm = to_shared_memory(block)
+    try:
+        # Each partition gets a share of the fleet counts proportional to its size
+        sizes = [hi - lo for lo, hi in ranges]
+        part_counts = split_counts(optimizer.vehicles['number'].to_numpy(dtype=float), sizes)
+        # A fixed N_CLUSTERS is the total over all partitions, shared out the same way
+        part_clusters = split_counts([optimizer.N_CLUSTERS or np.inf], sizes)[:, 0]
+        jobs = []
+        for (lo, hi), counts, n_clusters in zip(ranges, part_counts, part_clusters):
+            vehicles = optimizer.vehicles.assign(number=counts)
+            # The savings engine draws on priority_vehicles, so it needs the same share
+            job_config = dict(config, vehicles=vehicles, priority_vehicles=vehicles.loc[optimizer.priority_vehicles.index],
+                              N_CLUSTERS=max(1, int(n_clusters)) if optimizer.N_CLUSTERS else None)
+            jobs.append((shm.name, block.shape, int(lo), int(hi), job_config, method, engine))
+        workers = workers or min(len(jobs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+            # pool.map yields in submission (key) order as soon as each result is ready
+            results = pool.map(_solve_partition, *zip(*jobs)) if pool else (_solve_partition(*job) for job in jobs)
+            for positions, labels, part_trips in results:
+                cluster_labels[positions] = labels + offset
+                for trip in part_trips:
+                    trip['Cluster'] = int(trip['Cluster']) + offset
+                    trip['Trip_ID'] = f"Trip_{trip['Cluster']}"
+                    trip['Shipments'] = shipment_ids[trip['Shipments']].tolist()
+                offset += int(labels.max()) + 1 if len(labels) else 0
+                yield part_trips
+    finally:
+        shm.close()
+        shm.unlink()
+
+    optimizer.processed_shipments['Cluster'] = cluster_labels
+    optimizer.logger.info(f"Solved {len(ranges)} partitions on {workers} worker(s)")
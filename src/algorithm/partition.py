@@ -0,0 +1,142 @@
+import numpy as np
+
+GRID_BITS = 16
+KM_PER_DEGREE = 111.0  # north-south; east-west is scaled by cos(latitude)
+
+
+def _spread_bits(values):
+    """Insert a zero bit between each of the low 16 bits (for Morton interleaving)."""
+    values = values.astype(np.uint32) & 0xFFFF
+    values = (values | (values << 8)) & 0x00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F
+    values = (values | (values << 2)) & 0x33333333
+    values = (values | (values << 1)) & 0x55555555
+    return values
+
+
+def morton_codes(lats, lons, bits=GRID_BITS):
+    """Z-order (geohash-like) cell codes on a square grid over the points' bounding box."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    # Scale longitude so grid cells are roughly square on the ground
+    x = lons * np.cos(np.radians(lats.mean()))
+    y = lats
+    span = max(np.ptp(x), np.ptp(y), 1e-12)
+    cells = (1 << bits) - 1
+    gx = np.floor((x - x.min()) / span * cells).astype(np.uint32)
+    gy = np.floor((y - y.min()) / span * cells).astype(np.uint32)
+    return _spread_bits(gx) | (_spread_bits(gy) << 1)
+
+
+def _leaf_ranges(codes, capacity, bits):
+    """Quadtree leaves over sorted Morton codes, in Z-order, each holding <= capacity points."""
+    leaves = []
+    stack = [(0, len(codes), 0)]
+    while stack:
+        lo, hi, level = stack.pop()
+        if hi - lo <= capacity:
+            leaves.append((lo, hi))
+            continue
+        if level == bits:
+            # Identical cells (e.g. duplicate addresses): balanced chunks
+            parts = -(-(hi - lo) // capacity)
+            bounds = np.linspace(lo, hi, parts + 1).astype(int)
+            leaves.extend(zip(bounds[:-1], bounds[1:]))
+            continue
+
+        shift = 2 * (bits - level - 1)
+        quadrants = codes[lo:hi] >> shift
+        split = lo + np.searchsorted(quadrants, (codes[lo] >> shift) + np.arange(1, 4))
+        bounds = [lo, *split, hi]
+        # Push in reverse so children pop in Z-order
+        for child in range(3, -1, -1):
+            if bounds[child] < bounds[child + 1]:
+                stack.append((bounds[child], bounds[child + 1], level + 1))
+    return leaves
+
+
+def capacity_partition(lats, lons, capacity, bits=GRID_BITS, max_radius_km=1.5):
+    """Split shipments into spatially compact groups of at most ``capacity``.
+
+    Points are bucketed into Z-ordered grid cells, cells holding more than
+    ``capacity`` points are split recursively (quadtree), and consecutive
+    small leaves are packed back together up to ``capacity``. Z-order jumps
+    between distant cells, so a leaf only joins the current group while the
+    group's bounding box stays within ``max_radius_km`` of its centre (half
+    diagonal). Runs in O(n log n) and assigns every point to exactly one group.
+    """
+    capacity = int(capacity)
+    if capacity < 1:
+        raise ValueError("capacity must be at least 1")
+
+    n = len(lats)
+    labels = np.empty(n, dtype=np.int64)
+    if n == 0:
+        return labels
+
+    codes = morton_codes(lats, lons, bits=bits)
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+
+    # Leaf bounding boxes in km on a local equirectangular projection
+    leaves = np.asarray(_leaf_ranges(codes, capacity, bits))
+    lats = np.asarray(lats, dtype=np.float64)[order]
+    y = lats * KM_PER_DEGREE
+    x = np.asarray(lons, dtype=np.float64)[order] * KM_PER_DEGREE * np.cos(np.radians(lats.mean()))
+    starts = leaves[:, 0]
+    boxes = np.column_stack([np.minimum.reduceat(x, starts), np.maximum.reduceat(x, starts),
+                             np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)])
+    max_diagonal = 2 * max_radius_km
+
+    group = -1
+    group_size = capacity
+    for (lo, hi), (x_min, x_max, y_min, y_max) in zip(leaves, boxes):
+        size = hi - lo
+        if group_size + size <= capacity:
+            merged = (min(box[0], x_min), max(box[1], x_max), min(box[2], y_min), max(box[3], y_max))
+            fits = np.hypot(merged[1] - merged[0], merged[3] - merged[2]) <= max_diagonal
+        else:
+            fits = False
+        if fits:
+            box = merged
+        else:
+            group += 1
+            group_size = 0
+            box = (x_min, x_max, y_min, y_max)
+        labels[order[lo:hi]] = group
+        group_size += size
+    return labels
+
+
+def benchmark(sizes=(1_000, 10_000, 100_000), capacity=8, seed=42, kmeans_max=100_000):
+    """Time capacity_partition against the KMeans(n_clusters=n // 5) path."""
+    import time
+    from sklearn.cluster import KMeans
+
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in sizes:
+        lats = 19.0 + rng.random(n) * 0.3
+        lons = 72.8 + rng.random(n) * 0.3
+
+        start = time.perf_counter()
+        labels = capacity_partition(lats, lons, capacity)
+        grid_seconds = time.perf_counter() - start
+        sizes_per_group = np.bincount(labels)
+
+        kmeans_seconds = None
+        if n <= kmeans_max:
+            start = time.perf_counter()
+            KMeans(n_clusters=max(1, n // 5), random_state=42).fit_predict(np.column_stack([lats, lons]))
+            kmeans_seconds = time.perf_counter() - start
+
+        results.append({'shipments': n, 'grid_s': grid_seconds, 'kmeans_s': kmeans_seconds,
+                        'groups': len(sizes_per_group), 'max_group': int(sizes_per_group.max())})
+        kmeans_text = f"{kmeans_seconds:9.3f}s" if kmeans_seconds is not None else "  skipped"
+        print(f"{n:>8} shipments  grid {grid_seconds:8.3f}s  kmeans {kmeans_text}  "
+              f"groups {len(sizes_per_group)} (max size {sizes_per_group.max()})")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from metrics import CACHE_REQUESTS
+
+# Optimizer settings that change the result for the same inputs
+OPTIMIZER_CONSTANTS = ['DELIVERY_TIME_PER_SHIPMENT', 'TRAVEL_TIME_PER_KM',
+                       'CAPACITY_UTILIZATION_THRESHOLD', 'TRIP_TIME_LIMIT', 'ROUTE_TIME_BUDGET',
+                       'MAX_TRIPS_PER_VEHICLE', 'N_CLUSTERS']
+# Bump when cached results change layout, units or feasibility rules
+# (2: time slots in minutes; 3: delivery stops count towards TRIP_TIME_LIMIT;
+#  4: Trip_Time and Time_Utilization include delivery stops)
+RESULT_FORMAT_VERSION = 4
+
+
+def _hash_frame(digest, frame):
+    digest.update(json.dumps([str(col) for col in frame.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+
+
+def optimization_key(optimizer, options=None):
+    """Content hash of an optimizer's loaded inputs, its constants and run options."""
+    digest = hashlib.sha256()
+    _hash_frame(digest, optimizer.shipments)
+    _hash_frame(digest, optimizer.vehicles)
+    _hash_frame(digest, optimizer.store.to_frame().T)
+    constants = {name: getattr(optimizer, name) for name in OPTIMIZER_CONSTANTS}
+    constants['distance_provider'] = getattr(optimizer.distance_provider, 'name', None)
+    constants['result_format'] = RESULT_FORMAT_VERSION
+    digest.update(json.dumps([constants, options or {}], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier result cache: an in-memory LRU in front of a size-bounded directory.
+
+    Disk entries are pickles named by key; when the directory grows past
+    ``disk_max_bytes`` the least recently used files are removed. Values
+    put with ``persist=False`` stay in memory only.
+    """
+
+    def __init__(self, memory_items=32, disk_dir=None, disk_max_bytes=256 * 2**20, name='result'):
+        self.logger = logging.getLogger(__name__)
+        self.name = name  # 'cache' label on the cache request counter
+        self.memory_items = memory_items
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache=self.name, result='hit')
+                return self._memory[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache=self.name, result='miss')
+                return None
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache=self.name, result='hit')
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value, persist=True):
+        with self._lock:
+            self._remember(key, value)
+        if persist:
+            self._write_disk(key, value)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._memory:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._path(key))
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)  # mark as recently used for eviction
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except Exception as e:
+            self.logger.warning(f"Could not write cache entry {key}: {e}")
+
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith('.pkl'):
+                try:
+                    stat = os.stat(os.path.join(self.disk_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+                total -= size
+            except FileNotFoundError:
+                pass
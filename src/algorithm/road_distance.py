@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from geo import haversine_many_to_many
+from metrics import CACHE_REQUESTS
+
+COORD_SCALE = 10**5  # cache key resolution: 1e-5 degrees (~1 m)
+# Bump when the cache tables change; older tables are dropped (2: rows keyed by provider name)
+CACHE_SCHEMA_VERSION = 2
+
+
+class DistanceProvider:
+    """Pairwise road distances (km) and durations (min) between coordinate lists."""
+
+    name = 'base'
+
+    def matrix(self, src_lats, src_lons, dst_lats, dst_lons):
+        raise NotImplementedError
+
+    def route(self, lats, lons):
+        """Road geometry [[lat, lon], ...] and length (km) through the points in order."""
+        raise NotImplementedError
+
+
+class HaversineProvider(DistanceProvider):
+    """Deterministic offline stand-in: straight-line distance times a detour factor."""
+
+    def __init__(self, detour_factor=1.3, minutes_per_km=5):
+        self.detour_factor = detour_factor
+        self.minutes_per_km = minutes_per_km
+        self.name = f"haversine:{detour_factor}:{minutes_per_km}"
+
+    def matrix(self, src_lats, src_lons, dst_lats, dst_lons):
+        distance = haversine_many_to_many(src_lats, src_lons, dst_lats, dst_lons) * self.detour_factor
+        return distance, distance * self.minutes_per_km
+
+    def route(self, lats, lons):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        legs = haversine_many_to_many(lats[:-1], lons[:-1], lats[1:], lons[1:]).diagonal()
+        return np.column_stack([lats, lons]).tolist(), float(legs.sum() * self.detour_factor)
+
+
+class OSRMProvider(DistanceProvider):
+    """OSRM HTTP client using batched /table requests."""
+
+    def __init__(self, base_url='http://router.project-osrm.org', profile='driving', max_table_size=100, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.profile = profile
+        self.max_table_size = max_table_size
+        self.timeout = timeout
+        self.name = f"osrm:{self.base_url}:{profile}"
+
+    def _get(self, service, lats, lons, params):
+        import requests
+
+        coords = ';'.join(f"{lon:.6f},{lat:.6f}" for lat, lon in zip(lats, lons))
+        response = requests.get(f"{self.base_url}/{service}/v1/{self.profile}/{coords}",
+                                params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get('code') != 'Ok':
+            raise RuntimeError(f"OSRM {service} request failed: {data.get('message', data.get('code'))}")
+        return data
+
+    def matrix(self, src_lats, src_lons, dst_lats, dst_lons):
+        src_lats, src_lons = np.asarray(src_lats, dtype=np.float64), np.asarray(src_lons, dtype=np.float64)
+        dst_lats, dst_lons = np.asarray(dst_lats, dtype=np.float64), np.asarray(dst_lons, dtype=np.float64)
+        distance = np.empty((len(src_lats), len(dst_lats)))
+        duration = np.empty_like(distance)
+
+        # Each request carries at most max_table_size coordinates in total
+        step = max(1, self.max_table_size // 2)
+        for i in range(0, len(src_lats), step):
+            for j in range(0, len(dst_lats), step):
+                rows = slice(i, i + step)
+                cols = slice(j, j + step)
+                n_src = len(src_lats[rows])
+                data = self._get(
+                    'table',
+                    np.concatenate([src_lats[rows], dst_lats[cols]]),
+                    np.concatenate([src_lons[rows], dst_lons[cols]]),
+                    {
+                        'sources': ';'.join(map(str, range(n_src))),
+                        'destinations': ';'.join(map(str, range(n_src, n_src + len(dst_lats[cols])))),
+                        'annotations': 'distance,duration'
+                    }
+                )
+                distance[rows, cols] = np.asarray(data['distances'], dtype=np.float64) / 1000
+                duration[rows, cols] = np.asarray(data['durations'], dtype=np.float64) / 60
+        return distance, duration
+
+    def route(self, lats, lons):
+        data = self._get('route', lats, lons, {'overview': 'full', 'geometries': 'geojson'})
+        route = data['routes'][0]
+        return [[lat, lon] for lon, lat in route['geometry']['coordinates']], route['distance'] / 1000
+
+
+class CachedDistanceProvider(DistanceProvider):
+    """SQLite-backed cache of leg distances/durations and route geometries.
+
+    Only pairs missing from the cache are sent to the wrapped provider, in
+    one batched matrix call over the rows and columns that have misses.
+    Rows are keyed by the provider's name, so providers can share a file.
+    """
+
+    def __init__(self, provider, path=':memory:'):
+        self.logger = logging.getLogger(__name__)
+        self.provider = provider
+        self.path = path
+        self.name = provider.name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connect()
+
+    def __getstate__(self):
+        # Worker processes reopen the cache file instead of sharing a connection
+        return {'provider': self.provider, 'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['provider'], state['path'])
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            if self._db.execute("PRAGMA user_version").fetchone()[0] < CACHE_SCHEMA_VERSION:
+                # Older rows do not record which provider measured them
+                self._db.execute("DROP TABLE IF EXISTS legs")
+                self._db.execute("DROP TABLE IF EXISTS routes")
+                self._db.execute(f"PRAGMA user_version = {CACHE_SCHEMA_VERSION}")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS legs (
+                    provider TEXT, src_lat INTEGER, src_lon INTEGER, dst_lat INTEGER, dst_lon INTEGER,
+                    distance REAL, duration REAL,
+                    PRIMARY KEY (provider, src_lat, src_lon, dst_lat, dst_lon)
+                ) WITHOUT ROWID
+            """)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS routes (
+                    provider TEXT, key TEXT, geometry TEXT, distance REAL,
+                    PRIMARY KEY (provider, key)
+                ) WITHOUT ROWID
+            """)
+
+    @staticmethod
+    def _keys(lats, lons):
+        return (np.round(np.asarray(lats, dtype=np.float64) * COORD_SCALE).astype(np.int64),
+                np.round(np.asarray(lons, dtype=np.float64) * COORD_SCALE).astype(np.int64))
+
+    def matrix(self, src_lats, src_lons, dst_lats, dst_lons):
+        src_lat_keys, src_lon_keys = self._keys(src_lats, src_lons)
+        dst_lat_keys, dst_lon_keys = self._keys(dst_lats, dst_lons)
+        n_src, n_dst = len(src_lat_keys), len(dst_lat_keys)
+        distance = np.full((n_src, n_dst), np.nan)
+        duration = np.full((n_src, n_dst), np.nan)
+
+        pairs = [(int(a), int(b), int(c), int(d), i, j)
+                 for i, (a, b) in enumerate(zip(src_lat_keys, src_lon_keys))
+                 for j, (c, d) in enumerate(zip(dst_lat_keys, dst_lon_keys))]
+        with self._lock:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (a INTEGER, b INTEGER, c INTEGER, d INTEGER, i INTEGER, j INTEGER)")
+            self._db.execute("DELETE FROM wanted")
+            self._db.executemany("INSERT INTO wanted VALUES (?, ?, ?, ?, ?, ?)", pairs)
+            found = self._db.execute("""
+                SELECT w.i, w.j, l.distance, l.duration FROM wanted w
+                JOIN legs l ON l.provider = ? AND l.src_lat = w.a AND l.src_lon = w.b
+                            AND l.dst_lat = w.c AND l.dst_lon = w.d
+            """, (self.name,)).fetchall()
+        if found:
+            found = np.asarray(found)
+            rows, cols = found[:, 0].astype(int), found[:, 1].astype(int)
+            distance[rows, cols] = found[:, 2]
+            duration[rows, cols] = found[:, 3]
+
+        missing = np.isnan(distance)
+        n_missing = int(missing.sum())
+        self.hits += missing.size - n_missing
+        self.misses += n_missing
+        CACHE_REQUESTS.inc(missing.size - n_missing, cache='road_distance', result='hit')
+        CACHE_REQUESTS.inc(n_missing, cache='road_distance', result='miss')
+        if n_missing:
+            rows = np.flatnonzero(missing.any(axis=1))
+            cols = np.flatnonzero(missing.any(axis=0))
+            fetched_distance, fetched_duration = self.provider.matrix(
+                np.asarray(src_lats)[rows], np.asarray(src_lons)[rows],
+                np.asarray(dst_lats)[cols], np.asarray(dst_lons)[cols]
+            )
+            distance[np.ix_(rows, cols)] = fetched_distance
+            duration[np.ix_(rows, cols)] = fetched_duration
+
+            new_legs = [(self.name, int(src_lat_keys[r]), int(src_lon_keys[r]), int(dst_lat_keys[c]), int(dst_lon_keys[c]),
+                         float(fetched_distance[a, b]), float(fetched_duration[a, b]))
+                        for a, r in enumerate(rows) for b, c in enumerate(cols)]
+            with self._lock, self._db:
+                self._db.executemany("INSERT OR REPLACE INTO legs VALUES (?, ?, ?, ?, ?, ?, ?)", new_legs)
+        return distance, duration
+
+    def route(self, lats, lons):
+        lat_keys, lon_keys = self._keys(lats, lons)
+        key = hashlib.sha256(np.stack([lat_keys, lon_keys]).tobytes()).hexdigest()
+        with self._lock:
+            row = self._db.execute("SELECT geometry, distance FROM routes WHERE provider = ? AND key = ?",
+                                   (self.name, key)).fetchone()
+        if row is not None:
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache='road_route', result='hit')
+            return json.loads(row[0]), row[1]
+
+        self.misses += 1
+        CACHE_REQUESTS.inc(cache='road_route', result='miss')
+        geometry, distance = self.provider.route(lats, lons)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?)",
+                             (self.name, key, json.dumps(geometry), distance))
+        return geometry, distance
+
+    def close(self):
+        self._db.close()
+
+
+def default_provider(cache_path=None):
+    """OSRM when SMARTROUTE_OSRM_URL is set, otherwise the offline stand-in, optionally cached on disk."""
+    osrm_url = os.environ.get('SMARTROUTE_OSRM_URL')
+    provider = OSRMProvider(osrm_url) if osrm_url else HaversineProvider()
+    if cache_path:
+        provider = CachedDistanceProvider(provider, cache_path)
+    return provider
@@ -0,0 +1,138 @@
+import time
+
+import numpy as np
+
+from geo import haversine_many_to_many
+
+
+def route_matrix(store_lat, store_lon, lats, lons, provider=None):
+    """Distance matrix (km) over the store (node 0) followed by every stop.
+
+    Straight-line haversine unless a road-distance ``provider`` is given.
+    """
+    all_lats = np.concatenate([[store_lat], np.asarray(lats, dtype=np.float64)])
+    all_lons = np.concatenate([[store_lon], np.asarray(lons, dtype=np.float64)])
+    if provider is not None:
+        return provider.matrix(all_lats, all_lons, all_lats, all_lons)[0]
+    return haversine_many_to_many(all_lats, all_lons, all_lats, all_lons)
+
+
+def tour_length(tour, dist):
+    """Length of the closed tour store -> stops -> store."""
+    tour = np.asarray(tour)
+    return float(dist[tour[:-1], tour[1:]].sum() + dist[tour[-1], tour[0]])
+
+
+def _group_blocks(groups):
+    """Contiguous [start, stop) tour positions shared by each group (position 0 is the store)."""
+    blocks = []
+    start = 1
+    for position in range(2, len(groups) + 1):
+        if position == len(groups) or groups[position] != groups[start]:
+            blocks.append((start, position))
+            start = position
+    return blocks
+
+
+def nearest_neighbour_tour(dist, groups=None):
+    """Greedy construction from the store; stops of earlier groups are visited first."""
+    n = len(dist)
+    if groups is None:
+        groups = np.zeros(n, dtype=np.int64)
+    tour = [0]
+    current = 0
+    for group in np.unique(groups[1:]):
+        remaining = [node for node in range(1, n) if groups[node] == group]
+        while remaining:
+            next_node = min(remaining, key=lambda node: dist[current, node])
+            remaining.remove(next_node)
+            tour.append(next_node)
+            current = next_node
+    return tour
+
+
+def two_opt(tour, dist, blocks, deadline):
+    """Segment reversals inside each block until no improving move remains."""
+    tour = np.asarray(tour)
+    n = len(tour)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for start, stop in blocks:
+            for i in range(start, stop - 1):
+                j = np.arange(i + 1, stop)
+                before = tour[i - 1]
+                after = tour[(j + 1) % n]
+                delta = (dist[before, tour[j]] + dist[tour[i], after]
+                         - dist[before, tour[i]] - dist[tour[j], after])
+                best = int(np.argmin(delta))
+                if delta[best] < -1e-9:
+                    tour[i:j[best] + 1] = tour[i:j[best] + 1][::-1].copy()
+                    improved = True
+    return tour.tolist()
+
+
+def or_opt(tour, dist, blocks, deadline, max_segment=3):
+    """Relocate segments of up to ``max_segment`` stops elsewhere in their block."""
+    tour = list(tour)
+    n = len(tour)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for start, stop in blocks:
+            for length in range(1, max_segment + 1):
+                for i in range(start, stop - length + 1):
+                    segment = tour[i:i + length]
+                    before, after = tour[i - 1], tour[(i + length) % n]
+                    removed = (dist[before, segment[0]] + dist[segment[-1], after]
+                               - dist[before, after])
+                    best_gain, best_move = 1e-9, None
+                    for p in range(start - 1, stop):
+                        if i - 1 <= p < i + length:
+                            continue
+                        a, b = tour[p], tour[(p + 1) % n]
+                        for candidate in (segment, segment[::-1]):
+                            added = dist[a, candidate[0]] + dist[candidate[-1], b] - dist[a, b]
+                            if removed - added > best_gain:
+                                best_gain, best_move = removed - added, (p, candidate)
+                    if best_move:
+                        p, candidate = best_move
+                        rest = tour[:i] + tour[i + length:]
+                        insert_at = p + 1 if p < i else p + 1 - length
+                        tour = rest[:insert_at] + list(candidate) + rest[insert_at:]
+                        improved = True
+    return tour
+
+
+def build_route(store_lat, store_lon, lats, lons, groups=None, time_budget=0.05, provider=None):
+    """Order stops into a store -> stops -> store tour.
+
+    Nearest-neighbour construction followed by 2-opt and Or-opt improvement
+    within ``time_budget`` seconds. When ``groups`` (e.g. time-slot starts)
+    are given, lower groups are always visited first and local search never
+    moves a stop across groups. Road distances from ``provider`` may be
+    asymmetric, so the search runs on the symmetrised matrix and the
+    returned length uses the real one. Returns (stop order as indices into
+    ``lats``, tour length in km).
+    """
+    n = len(lats)
+    if n == 0:
+        return [], 0.0
+
+    road = route_matrix(store_lat, store_lon, lats, lons, provider)
+    dist = road if provider is None else (road + road.T) / 2
+    node_groups = np.zeros(n + 1, dtype=np.int64)
+    if groups is not None:
+        node_groups[1:] = np.unique(np.asarray(groups), return_inverse=True)[1]
+
+    tour = nearest_neighbour_tour(dist, node_groups)
+    if n > 2:
+        blocks = _group_blocks(node_groups[tour])
+        deadline = time.perf_counter() + time_budget
+        while time.perf_counter() < deadline:
+            length = tour_length(tour, dist)
+            tour = or_opt(two_opt(tour, dist, blocks, deadline), dist, blocks, deadline)
+            if tour_length(tour, dist) >= length - 1e-9:
+                break
+
+    return [node - 1 for node in tour[1:]], round(tour_length(tour, road), 4)
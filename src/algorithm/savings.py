@@ -0,0 +1,125 @@
+import heapq
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM, haversine_one_to_many
+from routing import route_matrix, tour_length
+
+
+class _Route:
+    __slots__ = ('stops', 'length', 'farthest', 'window_start', 'window_end')
+
+    def __init__(self, stop, store_km, store_distance, window_start, window_end):
+        self.stops = [stop]
+        self.length = 2 * store_km
+        self.farthest = store_distance
+        self.window_start = window_start
+        self.window_end = window_end
+
+
+def _fits_some_vehicle(size, farthest, vehicles):
+    return any(size <= capacity and farthest <= radius for capacity, radius in vehicles)
+
+
+def savings_routes(store_lat, store_lon, lats, lons, slot_start, slot_end, vehicles,
+                   trip_time_limit, travel_time_per_km, delivery_time_per_shipment, neighbours=25, provider=None):
+    """Clarke-Wright savings construction for a single depot.
+
+    ``vehicles`` is a list of ``(capacity, max_radius)`` pairs; a merge is
+    accepted only if some vehicle can still carry the route, the trip time
+    (travel + per-shipment delivery) stays within ``trip_time_limit`` and
+    the stops' time slots still share a common window. Savings are only
+    generated between each stop and its ``neighbours`` nearest stops, kept
+    in a heap, and routes are merged with union-find, so the cost is
+    O(n k log(n k)) rather than O(n^2).
+
+    With a road-distance ``provider`` the savings and trip times use its
+    symmetrised store-and-stops matrix (one dense request), and tour km is
+    measured on the real matrix; vehicle radii stay straight-line, as
+    elsewhere.
+
+    Returns a list of ``(stop indices in visiting order, tour km)``.
+    """
+    from sklearn.neighbors import BallTree
+
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    n = len(lats)
+    if n == 0:
+        return []
+
+    store_distance = haversine_one_to_many(store_lat, store_lon, lats, lons)
+    road = None
+    store_km = store_distance
+    if provider is not None:
+        road = route_matrix(store_lat, store_lon, lats, lons, provider)
+        symmetric = (road + road.T) / 2
+        store_km = symmetric[0, 1:]
+    routes = [_Route(i, store_km[i], store_distance[i], slot_start[i], slot_end[i]) for i in range(n)]
+    parent = list(range(n))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    # Savings s(i, j) = d(0, i) + d(0, j) - d(i, j) over nearest-neighbour pairs
+    k = min(neighbours + 1, n)
+    tree = BallTree(np.radians(np.column_stack([lats, lons])), metric='haversine')
+    pair_distance, pair_index = tree.query(np.radians(np.column_stack([lats, lons])), k=k)
+    first = np.repeat(np.arange(n), k)
+    second = pair_index.ravel()
+    keep = first < second
+    first, second = first[keep], second[keep]
+    pair_km = pair_distance.ravel()[keep] * EARTH_RADIUS_KM if road is None else symmetric[first + 1, second + 1]
+    saving = store_km[first] + store_km[second] - pair_km
+
+    heap = [(-s, int(i), int(j)) for s, i, j in zip(saving, first, second) if s > 0]
+    heapq.heapify(heap)
+
+    while heap:
+        negative_saving, i, j = heapq.heappop(heap)
+        root_i, root_j = find(i), find(j)
+        if root_i == root_j:
+            continue
+        route_i, route_j = routes[root_i], routes[root_j]
+
+        # Only route endpoints can be joined
+        if i not in (route_i.stops[0], route_i.stops[-1]) or j not in (route_j.stops[0], route_j.stops[-1]):
+            continue
+
+        size = len(route_i.stops) + len(route_j.stops)
+        farthest = max(route_i.farthest, route_j.farthest)
+        window_start = max(route_i.window_start, route_j.window_start)
+        window_end = min(route_i.window_end, route_j.window_end)
+        length = route_i.length + route_j.length + negative_saving
+        trip_time = length * travel_time_per_km + size * delivery_time_per_shipment
+        if (window_start >= window_end or trip_time > trip_time_limit
+                or not _fits_some_vehicle(size, farthest, vehicles)):
+            continue
+
+        # Orient as [... i] + [j ...]
+        stops_i = route_i.stops if route_i.stops[-1] == i else route_i.stops[::-1]
+        stops_j = route_j.stops if route_j.stops[0] == j else route_j.stops[::-1]
+
+        # Union by size: the bigger route's root keeps the merged route
+        if len(route_i.stops) < len(route_j.stops):
+            root_i, root_j = root_j, root_i
+        parent[root_j] = root_i
+        merged = routes[root_i]
+        merged.stops = stops_i + stops_j
+        merged.length = length
+        merged.farthest = farthest
+        merged.window_start = window_start
+        merged.window_end = window_end
+        routes[root_j] = None
+
+    result = []
+    for node in range(n):
+        if find(node) == node:
+            route = routes[node]
+            length = route.length if road is None else tour_length([0] + [stop + 1 for stop in route.stops], road)
+            result.append((route.stops, float(length)))
+    return result
+
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from data import DATA_FOLDER, _read_snapshot, _write_snapshot
+
+POINTER_FILE = "CURRENT"
+# Optimizer attributes a prediction needs besides the frames below
+SERVING_CONSTANTS = ['DELIVERY_TIME_PER_SHIPMENT', 'TRAVEL_TIME_PER_KM', 'CAPACITY_UTILIZATION_THRESHOLD',
+                     'TRIP_TIME_LIMIT', 'ROUTE_TIME_BUDGET']
+SHIPMENT_COLUMNS = ['Shipment ID', 'Latitude', 'Longitude', 'Distance', 'Time Slot Start', 'Time Slot End', 'Cluster']
+
+
+def default_snapshot_dir():
+    """SMARTROUTE_SNAPSHOT_DIR, else tmpfs-backed /dev/shm when available, else the data folder."""
+    if os.environ.get('SMARTROUTE_SNAPSHOT_DIR'):
+        return os.environ['SMARTROUTE_SNAPSHOT_DIR']
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm/smartroute'
+    return os.path.join(DATA_FOLDER, '.serving')
+
+
+def serving_frames(optimizer):
+    """The read-only serving state of a built optimizer as plain column frames."""
+    summary = optimizer.cluster_summary.reset_index()
+    config = pd.DataFrame([{name: getattr(optimizer, name) for name in SERVING_CONSTANTS}])
+    return {
+        'clusters': summary,
+        'shipments': optimizer.processed_shipments[SHIPMENT_COLUMNS].reset_index(drop=True),
+        'vehicles': optimizer.vehicles.reset_index(drop=True),
+        'priority_vehicles': optimizer.priority_vehicles.reset_index(drop=True),
+        'store': optimizer.store.to_frame().T.reset_index(drop=True),
+        'config': config,
+    }
+
+
+def publish(optimizer, root, tag='', keep=3):
+    """Write a new snapshot version and atomically point CURRENT at it.
+
+    Versions are immutable directories; the pointer is replaced with
+    os.replace so readers see either the old or the new version, never a
+    partial one. Only the newest ``keep`` versions are retained; readers
+    still mapping a removed version keep working until they swap.
+    """
+    os.makedirs(root, exist_ok=True)
+    name = f"v{time.time_ns():020d}{'-' + tag if tag else ''}"
+    _write_snapshot(serving_frames(optimizer), os.path.join(root, name))
+
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix='.pointer-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'version': name, 'published_at': time.time()}, f)
+    os.replace(tmp_path, os.path.join(root, POINTER_FILE))
+
+    versions = sorted(entry for entry in os.listdir(root) if entry.startswith('v'))
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return name
+
+
+def load_optimizer(frames):
+    """Prediction-ready SmartRouteOptimizer over memory-mapped snapshot frames (no refit)."""
+    from algo import SmartRouteOptimizer
+
+    optimizer = SmartRouteOptimizer()
+    config = frames['config'].iloc[0]
+    for name in SERVING_CONSTANTS:
+        setattr(optimizer, name, config[name].item() if hasattr(config[name], 'item') else config[name])
+    optimizer.store = frames['store'].iloc[0]
+    optimizer.vehicles = frames['vehicles']
+    optimizer.priority_vehicles = frames['priority_vehicles']
+    optimizer.processed_shipments = frames['shipments']
+
+    summary = frames['clusters'].set_index('Cluster')
+    summary['Vehicle_Type'] = summary['Vehicle_Type'].where(summary['Vehicle_Type'].notna(), None)
+    optimizer.cluster_summary = summary
+    optimizer._index_clusters()
+    return optimizer
+
+
+class SnapshotReader:
+    """Follows the CURRENT pointer and serves the newest published optimizer.
+
+    The pointer is re-checked at most every ``check_interval`` seconds. A
+    new version is loaded by whichever request notices it first, under a
+    non-blocking lock; every other request keeps using the previous version
+    meanwhile, so readers never wait.
+    """
+
+    def __init__(self, root, check_interval=1.0):
+        self.logger = logging.getLogger(__name__)
+        self.root = root
+        self.check_interval = check_interval
+        self._current = (None, None)  # (version, optimizer), swapped as one reference
+        self._pointer_stat = None
+        self._next_check = 0.0
+        self._load_lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def current(self):
+        version, optimizer = self._current
+        now = time.monotonic()
+        if optimizer is None or now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._maybe_swap(block=optimizer is None)
+            version, optimizer = self._current
+        if optimizer is None:
+            raise RuntimeError(f"No serving snapshot published in {self.root}")
+        return optimizer
+
+    def _maybe_swap(self, block):
+        if not self._load_lock.acquire(blocking=block):
+            return
+        try:
+            pointer = os.path.join(self.root, POINTER_FILE)
+            try:
+                stat = os.stat(pointer)
+            except FileNotFoundError:
+                return
+            fingerprint = (stat.st_ino, stat.st_mtime_ns)
+            if fingerprint == self._pointer_stat:
+                return
+            with open(pointer) as f:
+                version = json.load(f)['version']
+            if version != self._current[0]:
+                optimizer = load_optimizer(_read_snapshot(os.path.join(self.root, version)))
+                self._current = (version, optimizer)
+                self.logger.info(f"Serving snapshot {version}")
+            self._pointer_stat = fingerprint
+        except Exception as e:
+            # Keep serving the version we have
+            self.logger.error(f"Could not load serving snapshot: {e}")
+        finally:
+            self._load_lock.release()
@@ -0,0 +1,190 @@
+import argparse
+import json
+import logging
+import sys
+from contextlib import redirect_stdout
+
+# Only argparse and the stdlib load at startup; each subcommand imports the
+# optimizer, Excel, plotting and benchmark backends it needs when it runs.
+
+
+def _log_level(args):
+    return logging.INFO if args.verbose else logging.WARNING
+
+
+def _optimized(args):
+    """Load, preprocess and optimize the workbook given on the command line."""
+    from algo import SmartRouteOptimizer
+
+    # Progress prints go to stderr so stdout stays clean for JSON/CSV output
+    with redirect_stdout(sys.stderr):
+        optimizer = SmartRouteOptimizer(logging_level=_log_level(args))
+        optimizer.load_data(args.input).preprocess_data()
+        result = optimizer.optimize_trips(method=args.method, engine=args.engine, partition_by=args.partition_by,
+                                          region_level=args.region_level, workers=args.workers)
+    return optimizer, result
+
+
+def optimize(args):
+    optimizer, result = _optimized(args)
+    trips = result.trips
+    assigned = int(trips['Stops'].sum())
+    summary = {
+        'trips': len(trips),
+        'vehicles': trips['Vehicle_Type'].value_counts().to_dict(),
+        'total_km': round(float(trips['Total_Distance'].sum()), 2),
+        'shipments_assigned': assigned,
+        'shipments_dropped': len(optimizer.processed_shipments) - assigned,
+    }
+
+    if args.output == '-':
+        json.dump(result.to_dict(), sys.stdout, default=str)
+        sys.stdout.write('\n')
+    elif args.output.lower().endswith('.json'):
+        with open(args.output, 'w') as f:
+            json.dump(result.to_dict(), f, default=str)
+        print(f"✅ Trips written to {args.output}", file=sys.stderr)
+    elif args.output:
+        from data import write_output_data
+
+        with redirect_stdout(sys.stderr):
+            write_output_data(result, args.output)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+def predict(args):
+    import pandas as pd
+
+    if args.file:
+        requests = pd.read_csv(args.file)
+    else:
+        rows = [item.split(',', 2) for item in args.shipments]
+        if any(len(row) != 3 for row in rows):
+            print("❌ Shipments must be given as LAT,LON,TIME_SLOT", file=sys.stderr)
+            return 2
+        requests = pd.DataFrame(rows, columns=['latitude', 'longitude', 'time_slot'])
+    if requests.empty:
+        print("❌ No shipments to predict", file=sys.stderr)
+        return 2
+
+    if args.snapshot:
+        # A model published by the API workers: no workbook parsing or refit
+        from serving_snapshot import SnapshotReader
+
+        optimizer = SnapshotReader(args.snapshot).current()
+    else:
+        optimizer, _ = _optimized(args)
+
+    predictions = optimizer.predict_vehicle_allocations(
+        requests['latitude'].tolist(), requests['longitude'].tolist(), requests['time_slot'].tolist()
+    )
+    output = requests[['latitude', 'longitude', 'time_slot']].reset_index(drop=True).join(predictions)
+    output.to_csv(sys.stdout, index=False)
+    return 0
+
+
+def render(args):
+    optimizer, result = _optimized(args)
+    optimizer.plot_shipments_on_map(result, args.out)
+    return 0
+
+
+def _parameter_values(spec):
+    """'NAME=v1,v2,...' -> (NAME, [numbers])."""
+    name, _, values = spec.partition('=')
+    if not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=v1,v2,... got {spec!r}")
+    numbers = []
+    for value in values.split(','):
+        number = float(value)
+        numbers.append(int(number) if number.is_integer() and '.' not in value else number)
+    return name.strip(), numbers
+
+
+def sweep(args):
+    from sweep import parameter_grid
+
+    with redirect_stdout(sys.stderr):
+        from algo import SmartRouteOptimizer
+
+        optimizer = SmartRouteOptimizer(logging_level=_log_level(args))
+        optimizer.load_data(args.input).preprocess_data()
+    grid = parameter_grid(**dict(args.param))
+    table = optimizer.sweep_parameters(grid, method=args.method, engine=args.engine, workers=args.workers)
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"✅ Sweep of {len(table)} parameter sets written to {args.out}", file=sys.stderr)
+    else:
+        table.to_csv(sys.stdout, index=False)
+    return 0
+
+
+def bench(args, extra):
+    import bench as benchmark
+
+    return benchmark.main(extra)
+
+
+def _add_model_arguments(parser):
+    parser.add_argument('--input', default=None, help="input workbook (default: data/SmartRoute Optimizer.xlsx)")
+    parser.add_argument('--method', default='kmeans', choices=['kmeans', 'grid'])
+    parser.add_argument('--engine', default='cluster', choices=['cluster', 'savings'])
+    parser.add_argument('--partition-by', default=None, choices=['timeslot'])
+    parser.add_argument('--region-level', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='smartroute', description="SmartRoute trip optimizer")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log pipeline progress")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    optimize_parser = commands.add_parser('optimize', help="build trips and write them out")
+    _add_model_arguments(optimize_parser)
+    optimize_parser.add_argument('--output', default=None,
+                                 help="trips file: .xlsx (legacy layout), .json (compact), '-' for stdout "
+                                      "or '' to skip (default: the sample output workbook)")
+
+    predict_parser = commands.add_parser('predict', help="predict vehicles for new shipments")
+    _add_model_arguments(predict_parser)
+    predict_parser.add_argument('shipments', nargs='*', metavar='LAT,LON,TIME_SLOT')
+    predict_parser.add_argument('--file', help="CSV with latitude, longitude and time_slot columns")
+    predict_parser.add_argument('--snapshot', help="serve from a published snapshot directory instead of fitting")
+
+    render_parser = commands.add_parser('render', help="build trips and render the route map")
+    _add_model_arguments(render_parser)
+    render_parser.add_argument('--out', default="optimized_routes_map.html")
+
+    sweep_parser = commands.add_parser('sweep', help="compare trips across a grid of optimizer parameters")
+    _add_model_arguments(sweep_parser)
+    sweep_parser.add_argument('--param', type=_parameter_values, action='append', required=True,
+                              metavar='NAME=v1,v2,...',
+                              help="values to sweep, e.g. TRIP_TIME_LIMIT=90,120 or N_CLUSTERS=150,250 (repeatable)")
+    sweep_parser.add_argument('--out', help="write the comparison table as CSV here (default: stdout)")
+
+    commands.add_parser('bench', add_help=False, help="run the pipeline benchmark (options: bench --help)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'bench':
+        return bench(args, extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    if getattr(args, 'input', None) is None:
+        from data import INPUT_FILE
+
+        args.input = INPUT_FILE
+    if args.command == 'optimize' and args.output is None:
+        from data import OUT_FILE
+
+        args.output = OUT_FILE
+    return {'optimize': optimize, 'predict': predict, 'render': render, 'sweep': sweep}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from parallel import SHARED_COLUMNS, to_shared_memory
+
+# Optimizer constants a sweep may vary
+SWEEP_PARAMETERS = ['DELIVERY_TIME_PER_SHIPMENT', 'TRAVEL_TIME_PER_KM', 'CAPACITY_UTILIZATION_THRESHOLD',
+                    'TRIP_TIME_LIMIT', 'ROUTE_TIME_BUDGET', 'MAX_TRIPS_PER_VEHICLE', 'N_CLUSTERS']
+# Constants an engine never reads; sweeping them would only repeat the same trips
+INERT_PARAMETERS = {'savings': ['CAPACITY_UTILIZATION_THRESHOLD', 'ROUTE_TIME_BUDGET', 'N_CLUSTERS']}
+
+# Per-process sweep state, set up once by _init_worker
+_worker = {}
+
+
+def parameter_grid(**values):
+    """Every combination of the given parameter values, as a list of dicts."""
+    unknown = [name for name in values if name not in SWEEP_PARAMETERS]
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(unknown)}")
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+def _init_worker(shm_name, shape, config):
+    """Attach the shared shipment block once per process and build its base frame."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    frame = pd.DataFrame(block, columns=SHARED_COLUMNS)
+    frame['Shipment ID'] = frame['Position'].to_numpy(dtype=np.int64)
+    frame['Time Slot Start'] = frame['Time Slot Start'].astype(int)
+    frame['Time Slot End'] = frame['Time Slot End'].astype(int)
+    _worker.update(shm=shm, frame=frame.drop(columns='Position'), config=config, labels={}, routes={})
+
+
+def _release_worker():
+    shm = _worker.get('shm')
+    _worker.clear()
+    if shm is not None:
+        shm.close()
+
+
+def _run_config(index, params, method, engine):
+    """Solve one parameter set in this worker and return its comparison row."""
+    from algo import SmartRouteOptimizer
+
+    config = dict(_worker['config'])
+    start = time.perf_counter()
+    optimizer = SmartRouteOptimizer(logging_level=config.pop('logging_level'))
+    optimizer.__dict__.update(config)
+    optimizer.__dict__.update(params)
+    optimizer.processed_shipments = _worker['frame'].copy()
+    optimizer._route_cache = _worker['routes']
+
+    # Cluster labels depend only on the method and cluster count, so parameter
+    # sets that share them in this worker skip the clustering
+    label_key = (method, optimizer.N_CLUSTERS)
+    if engine == 'cluster' and label_key in _worker['labels']:
+        optimizer.processed_shipments['Cluster'] = _worker['labels'][label_key]
+        trips = optimizer._build_trips()
+    else:
+        trips = optimizer._solve(method, engine)
+        if engine == 'cluster':
+            _worker['labels'][label_key] = optimizer.processed_shipments['Cluster'].to_numpy()
+    wall_time = time.perf_counter() - start
+
+    assigned = sum(len(trip['Shipments']) for trip in trips)
+    row = {'config': index, **params,
+           'vehicles': len(trips),
+           'total_km': round(sum(trip['Total_Distance'] for trip in trips), 2),
+           'shipments_assigned': assigned,
+           'shipments_dropped': len(optimizer.processed_shipments) - assigned,
+           'capacity_utilization': round(float(np.mean([trip['Capacity_Utilization'] for trip in trips])), 4)
+           if trips else 0.0,
+           'time_utilization': round(float(np.mean([trip['Time_Utilization'] for trip in trips])), 4)
+           if trips else 0.0,
+           'wall_time_s': round(wall_time, 3)}
+    used = pd.Series([trip['Vehicle_Type'] for trip in trips], dtype=object).value_counts()
+    for vehicle_type in optimizer.vehicles['vehicle_type']:
+        row[f'vehicles_{vehicle_type}'] = int(used.get(vehicle_type, 0))
+    return row
+
+
+def run_sweep(optimizer, grid, method='kmeans', engine='cluster', workers=None):
+    """Solve every parameter set in ``grid`` over one copy of the preprocessed data.
+
+    Coordinates, distances and slots go into shared memory once; each pool
+    process attaches to it at start-up and keeps the cluster labels and
+    tours it has computed, since neither depends on the swept time and
+    threshold constants. Parameter sets are ordered so that those sharing a
+    cluster count land on the same process. Returns a DataFrame with one
+    row per parameter set, in grid order.
+    """
+    names = list(dict.fromkeys(name for params in grid for name in params))
+    unknown = [name for name in names if name not in SWEEP_PARAMETERS]
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(unknown)}")
+    inert = [name for name in names if name in INERT_PARAMETERS.get(engine, [])]
+    if inert:
+        raise ValueError(f"The {engine} engine does not use: {', '.join(inert)}")
+    if not grid:
+        return pd.DataFrame()
+    # Parameters a set leaves out keep the optimizer's value, so every row lists all swept names
+    grid = [{name: params.get(name, getattr(optimizer, name)) for name in names} for params in grid]
+
+    shipments = optimizer.processed_shipments
+    block = np.column_stack([
+        np.arange(len(shipments), dtype=np.float64),
+        shipments['Latitude'].to_numpy(dtype=np.float64),
+        shipments['Longitude'].to_numpy(dtype=np.float64),
+        shipments['Distance'].to_numpy(dtype=np.float64),
+        shipments['Time Slot Start'].to_numpy(dtype=np.float64),
+        shipments['Time Slot End'].to_numpy(dtype=np.float64),
+    ])
+    config = {
+        'logging_level': optimizer.logger.getEffectiveLevel(),
+        'vehicles': optimizer.vehicles,
+        'priority_vehicles': optimizer.priority_vehicles,
+        'store': optimizer.store,
+        'distance_provider': optimizer.distance_provider,
+        **{name: getattr(optimizer, name) for name in SWEEP_PARAMETERS},
+    }
+
+    order = sorted(range(len(grid)), key=lambda i: (grid[i].get('N_CLUSTERS') or 0, i))
+    tasks = [(i, grid[i], method, engine) for i in order]
+    workers = workers or min(len(tasks), os.cpu_count() or 1)
+
+    shm = to_shared_memory(block)
+    try:
+        if workers <= 1:
+            _init_worker(shm.name, block.shape, config)
+            try:
+                rows = [_run_config(*task) for task in tasks]
+            finally:
+                _release_worker()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shm.name, block.shape, config)) as pool:
+                # Contiguous chunks keep same-cluster-count sets on one process
+                chunksize = max(1, len(tasks) // (workers * 4))
+                rows = list(pool.map(_run_config, *zip(*tasks), chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    optimizer.logger.info(f"Swept {len(grid)} parameter sets on {workers} worker(s)")
+    return pd.DataFrame(rows).sort_values('config').reset_index(drop=True)
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# "9-12", "9:30-12", "09:30:00-12:00:00"; seconds are accepted but ignored
+TIMESLOT_PATTERN = (r'^\s*(\d{1,2})(?::(\d{2}))?(?::\d{2})?\s*-\s*'
+                    r'(\d{1,2})(?::(\d{2}))?(?::\d{2})?\s*$')
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_timeslots(values, errors='raise'):
+    """Minute-of-day (start, end) arrays for timeslot strings.
+
+    Accepts whole hours ("9-12") and clock times ("09:30:00-12:00:00").
+    Each distinct string is parsed once, so the cost depends on the number
+    of distinct slots rather than on the number of rows. With
+    ``errors='raise'`` malformed slots raise ValueError and int64 arrays are
+    returned; with ``errors='coerce'`` they become NaN in float arrays.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).astype(str), use_na_sentinel=False)
+    parts = pd.Series(uniques, dtype=object).str.extract(TIMESLOT_PATTERN).astype(float)
+    start = parts[0].to_numpy() * 60 + np.nan_to_num(parts[1].to_numpy())
+    end = parts[2].to_numpy() * 60 + np.nan_to_num(parts[3].to_numpy())
+
+    minutes_ok = ~((parts[1] >= 60) | (parts[3] >= 60)).to_numpy()
+    valid = (start <= end) & (end <= MINUTES_PER_DAY) & minutes_ok
+    if errors == 'raise':
+        if not valid.all():
+            raise ValueError(f"Invalid time slot format: {uniques[np.flatnonzero(~valid)[0]]!r}")
+        return start.astype(np.int64)[codes], end.astype(np.int64)[codes]
+    start[~valid] = np.nan
+    end[~valid] = np.nan
+    return start[codes], end[codes]
+
+
+def parse_timeslot(value):
+    """Minute-of-day (start, end) for a single timeslot string."""
+    start, end = parse_timeslots([value])
+    return int(start[0]), int(end[0])
+
+
+def format_minutes(minutes):
+    """'HH:MM' strings for an array of minute-of-day values."""
+    codes, uniques = pd.factorize(np.asarray(minutes, dtype=np.int64))
+    labels = np.array([f"{value // 60:02d}:{value % 60:02d}" for value in uniques], dtype=object)
+    return labels[codes]
+
+
+def slots_overlap(start, end, other_start, other_end):
+    """Whether slots share any time, elementwise over arrays.
+
+    Slots are half-open, [start, end): back-to-back slots such as
+    07:00-09:30 and 09:30-12:00 do not overlap.
+    """
+    return (start < other_end) & (end > other_start)
+
+
+class IntervalIndex:
+    """Static centered interval tree answering slots_overlap queries.
+
+    Each node's center is an endpoint of one of its windows, so every node
+    holds at least one window (those containing the center), sorted once by
+    start and once by end. A query reports a searchsorted prefix/suffix at
+    nodes whose center lies outside it and descends one side; nodes whose
+    center lies inside it report all their windows and descend both sides,
+    which happens at most once per reported window. Finding the k windows
+    that overlap a slot therefore costs O(log n + k).
+    """
+
+    def __init__(self, starts, ends):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self._nodes = []
+        self._root = self._build(np.arange(len(self.starts)))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _build(self, ids):
+        if not len(ids):
+            return -1
+        starts, ends = self.starts[ids], self.ends[ids]
+        endpoints = np.concatenate([starts, ends])
+        # Upper median endpoint: each side keeps at most half of the windows
+        center = np.partition(endpoints, len(ids))[len(ids)]
+        here = (starts <= center) & (ends >= center)
+
+        by_start = ids[here][np.argsort(starts[here], kind='stable')]
+        by_end = ids[here][np.argsort(ends[here], kind='stable')]
+        node = len(self._nodes)
+        self._nodes.append(None)
+        left = self._build(ids[ends < center])
+        right = self._build(ids[starts > center])
+        self._nodes[node] = (center, by_start, self.starts[by_start], by_end, self.ends[by_end], left, right)
+        return node
+
+    def overlapping(self, start, end):
+        """Sorted ids of the windows overlapping the slot [start, end) (see slots_overlap)."""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                continue
+            center, by_start, sorted_starts, by_end, sorted_ends, left, right = self._nodes[node]
+            if end <= center:
+                # Every window here ends at or after the center, so only starts can rule it out
+                found.append(by_start[:np.searchsorted(sorted_starts, end, side='left')])
+                stack.append(left)
+            elif start >= center:
+                found.append(by_end[np.searchsorted(sorted_ends, start, side='right'):])
+                stack.append(right)
+            else:
+                found.append(by_start)
+                stack.extend((left, right))
+        if not found:
+            return np.array([], dtype=np.int64)
+        found = np.sort(np.concatenate(found))
+        # An empty slot (start == end) only overlaps windows ending after it
+        return found[self.ends[found] > start] if end <= start else found
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+
+from timeslots import format_minutes, slots_overlap
+
+TRIP_COLUMNS = ['Trip_ID', 'Cluster', 'Vehicle_Type', 'Total_Distance', 'Trip_Time',
+                'Capacity_Utilization', 'Time_Utilization', 'Coverage', 'Stops']
+# Flat one-row-per-shipment layout of the original output workbook and API
+LEGACY_COLUMNS = ['TRIP_ID', 'Shipment_ID', 'STOP_SEQ', 'Latitude', 'Longitude', 'TIME_SLOT', 'Shipments',
+                  'MST_DIST', 'TRIP_TIME', 'Vehicle_Type', 'CAPACITY_UTI', 'TIME_UTI', 'COV_UTI']
+# Fields of a per-trip record: the trip columns, its shipment IDs and its stops in visit order
+RECORD_FIELDS = TRIP_COLUMNS + ['Shipments', 'Route']
+
+
+class TripResult:
+    """Columnar optimization result.
+
+    ``trips`` holds one row per trip with numeric utilizations (fractions);
+    stops are parallel arrays ordered by trip and then visit order, with
+    ``stop_trip`` indexing into ``trips``. Flat views are built by
+    vectorized takes, and the legacy string format only when asked for.
+    """
+
+    def __init__(self, trips, stop_trip, stop_shipment, stop_seq, stop_lat, stop_lon, stop_slot_start, stop_slot_end):
+        self.trips = trips
+        self.stop_trip = stop_trip
+        self.stop_shipment = stop_shipment
+        self.stop_seq = stop_seq
+        self.stop_lat = stop_lat
+        self.stop_lon = stop_lon
+        self.stop_slot_start = stop_slot_start
+        self.stop_slot_end = stop_slot_end
+        self._legacy = None
+
+    @classmethod
+    def from_trips(cls, trips_df, processed_shipments):
+        """Build from the optimizer's trips table (Shipments as ID lists in visit order).
+
+        Trip_Time is the driving plus delivery minutes the optimizer checked
+        against its trip time limit.
+        """
+        if trips_df.empty:
+            trips_df = pd.DataFrame(columns=['Trip_ID', 'Cluster', 'Vehicle_Type', 'Total_Distance', 'Trip_Time',
+                                             'Capacity_Utilization', 'Time_Utilization', 'Coverage', 'Shipments'])
+        sizes = trips_df['Shipments'].map(len).to_numpy(dtype=np.int64)
+        shipment_ids = np.concatenate([np.asarray(ids) for ids in trips_df['Shipments']]) if sizes.sum() else np.array([])
+        stop_trip = np.repeat(np.arange(len(trips_df)), sizes)
+        stop_seq = np.arange(len(stop_trip)) - np.repeat(np.cumsum(sizes) - sizes, sizes) + 1
+
+        # Stops whose shipment is not in processed_shipments are dropped
+        shipments = processed_shipments.drop_duplicates('Shipment ID')
+        rows = pd.Index(shipments['Shipment ID']).get_indexer(shipment_ids)
+        keep = rows >= 0
+        rows = rows[keep]
+
+        trips = pd.DataFrame({
+            'Trip_ID': trips_df['Trip_ID'].to_numpy(),
+            'Cluster': trips_df['Cluster'].to_numpy(),
+            'Vehicle_Type': trips_df['Vehicle_Type'].to_numpy(),
+            'Total_Distance': trips_df['Total_Distance'].to_numpy(dtype=np.float64),
+            'Trip_Time': trips_df['Trip_Time'].to_numpy(dtype=np.float64),
+            'Capacity_Utilization': trips_df['Capacity_Utilization'].to_numpy(dtype=np.float64),
+            'Time_Utilization': trips_df['Time_Utilization'].to_numpy(dtype=np.float64),
+            'Coverage': trips_df['Coverage'].to_numpy(dtype=np.float64),
+            'Stops': sizes,
+        }, columns=TRIP_COLUMNS)
+        return cls(
+            trips,
+            stop_trip[keep],
+            shipments['Shipment ID'].to_numpy()[rows],
+            stop_seq[keep],
+            shipments['Latitude'].to_numpy(dtype=np.float64)[rows],
+            shipments['Longitude'].to_numpy(dtype=np.float64)[rows],
+            shipments['Time Slot Start'].to_numpy()[rows],
+            shipments['Time Slot End'].to_numpy()[rows],
+        )
+
+    def __len__(self):
+        return len(self.stop_trip)
+
+    @property
+    def empty(self):
+        return len(self.stop_trip) == 0
+
+    def shipment_index(self):
+        """Trip row per shipment ID."""
+        return pd.Series(self.stop_trip, index=self.stop_shipment)
+
+    def to_flat(self):
+        """One numeric row per shipment (slots in minutes of day), with its trip's fields joined in."""
+        trips = self.trips
+        take = self.stop_trip
+        return pd.DataFrame({
+            'TRIP_ID': trips['Trip_ID'].to_numpy()[take],
+            'Shipment_ID': self.stop_shipment,
+            'STOP_SEQ': self.stop_seq,
+            'Latitude': self.stop_lat,
+            'Longitude': self.stop_lon,
+            'Time_Slot_Start': self.stop_slot_start,
+            'Time_Slot_End': self.stop_slot_end,
+            'Vehicle_Type': trips['Vehicle_Type'].to_numpy()[take],
+            'MST_DIST': trips['Total_Distance'].to_numpy()[take],
+            'TRIP_TIME': trips['Trip_Time'].to_numpy()[take],
+            'Capacity_Utilization': trips['Capacity_Utilization'].to_numpy()[take],
+            'Time_Utilization': trips['Time_Utilization'].to_numpy()[take],
+            'Coverage': trips['Coverage'].to_numpy()[take],
+        })
+
+    def to_legacy(self):
+        """Flat frame in the original string format (built once, on first use)."""
+        if self._legacy is None:
+            flat = self.to_flat()
+            trips = self.trips
+            # Per-trip strings are formatted once and then repeated per stop
+            counts = np.bincount(self.stop_trip, minlength=len(trips))
+            groups = np.split(self.stop_shipment, np.cumsum(counts)[:-1])
+            shipment_lists = np.array([', '.join(map(str, ids)) for ids in groups], dtype=object)
+            capacity = np.array([f"{value:.0%}" for value in trips['Capacity_Utilization']], dtype=object)
+            time_uti = np.array([f"{value:.0%}" for value in trips['Time_Utilization']], dtype=object)
+            coverage = np.array([f"{value * 100:.2f}%" for value in trips['Coverage']], dtype=object)
+            take = self.stop_trip
+            self._legacy = pd.DataFrame({
+                'TRIP_ID': flat['TRIP_ID'],
+                'Shipment_ID': flat['Shipment_ID'],
+                'STOP_SEQ': flat['STOP_SEQ'],
+                'Latitude': flat['Latitude'],
+                'Longitude': flat['Longitude'],
+                'TIME_SLOT': format_minutes(self.stop_slot_start) + ' - ' + format_minutes(self.stop_slot_end),
+                'Shipments': shipment_lists[take],
+                'MST_DIST': flat['MST_DIST'],
+                'TRIP_TIME': flat['TRIP_TIME'],
+                'Vehicle_Type': flat['Vehicle_Type'],
+                'CAPACITY_UTI': capacity[take],
+                'TIME_UTI': time_uti[take],
+                'COV_UTI': coverage[take],
+            }, columns=LEGACY_COLUMNS)
+        return self._legacy
+
+    def trip_rows(self, vehicle_types=None, trip_ids=None, time_window=None, bbox=None):
+        """Positions of the trips matching every given filter, in trip order.
+
+        ``vehicle_types`` and ``trip_ids`` match whole trips. ``time_window``
+        (start, end minute of day) and ``bbox`` (min_lat, min_lon, max_lat,
+        max_lon) keep trips with at least one stop overlapping the window
+        and lying inside the box.
+        """
+        keep = np.ones(len(self.trips), dtype=bool)
+        if vehicle_types:
+            keep &= self.trips['Vehicle_Type'].isin(vehicle_types).to_numpy()
+        if trip_ids:
+            keep &= self.trips['Trip_ID'].isin(trip_ids).to_numpy()
+
+        stops = np.ones(len(self.stop_trip), dtype=bool)
+        if time_window is not None:
+            start, end = time_window
+            stops &= slots_overlap(self.stop_slot_start, self.stop_slot_end, start, end)
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            stops &= ((self.stop_lat >= min_lat) & (self.stop_lat <= max_lat) &
+                      (self.stop_lon >= min_lon) & (self.stop_lon <= max_lon))
+        if time_window is not None or bbox is not None:
+            keep &= np.bincount(self.stop_trip[stops], minlength=len(self.trips)) > 0
+        return np.flatnonzero(keep)
+
+    def records(self, rows=None, fields=None):
+        """JSON-ready per-trip records for trip positions ``rows``, limited to ``fields``."""
+        rows = np.arange(len(self.trips)) if rows is None else np.asarray(rows, dtype=np.int64)
+        fields = list(fields or RECORD_FIELDS)
+        unknown = [field for field in fields if field not in RECORD_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown trip fields: {', '.join(unknown)}")
+
+        columns = [field for field in fields if field in TRIP_COLUMNS]
+        records = self.trips.iloc[rows][columns].to_dict(orient='records')
+        if 'Shipments' in fields or 'Route' in fields:
+            # Stops are grouped by trip, so each trip is one contiguous slice
+            bounds = np.searchsorted(self.stop_trip, np.arange(len(self.trips) + 1))
+            for record, row in zip(records, rows):
+                lo, hi = bounds[row], bounds[row + 1]
+                shipments = self.stop_shipment[lo:hi].tolist()
+                if 'Shipments' in fields:
+                    record['Shipments'] = shipments
+                if 'Route' in fields:
+                    slots = format_minutes(self.stop_slot_start[lo:hi]) + ' - ' + format_minutes(self.stop_slot_end[lo:hi])
+                    record['Route'] = [
+                        {'Shipment_ID': shipment, 'STOP_SEQ': seq, 'Latitude': lat, 'Longitude': lon, 'TIME_SLOT': slot}
+                        for shipment, seq, lat, lon, slot in zip(shipments, self.stop_seq[lo:hi].tolist(),
+                                                                  self.stop_lat[lo:hi].tolist(),
+                                                                  self.stop_lon[lo:hi].tolist(), slots)
+                    ]
+        return records
+
+    def to_dict(self):
+        """Compact JSON-ready form: trip records plus parallel stop arrays."""
+        return {
+            'trips': self.trips.to_dict(orient='records'),
+            'stops': {
+                'trip': self.stop_trip.tolist(),
+                'shipment': self.stop_shipment.tolist(),
+                'seq': self.stop_seq.tolist(),
+            }
+        }
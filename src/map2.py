@@ -1,6 +1,11 @@
+import os
+import sys
+
 import folium
 import Excel_to_json
-import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'algorithm'))
+from road_distance import CachedDistanceProvider, OSRMProvider
 
 # Colors for polyline
 colors = ['red', 'blue', 'pink']
@@ -39,36 +44,17 @@ if vechicle == '4W-EV':
 if vechicle == '4W':
     colour_p = colors[2]
 
-# OpenStreetMap OSRM URL to get routes
-url = 'http://router.project-osrm.org/route/v1/driving/'
-
-# Format the URL to add points
-url += f"{store_longitude},{store_latitude};"  # Start from the store
-for i, cords in enumerate(shipment_points):
-    url += f"{cords[1]},{cords[0]}"  # OSRM expects longitude,latitude
-    if i < len(shipment_points) - 1:
-        url += ";"  # Add semicolon between points, but not at the end
-url += f";{store_longitude},{store_latitude}"  # End at the store
-
-# Add the options for the route (e.g., overview=full for full geometry)
-url += "?overview=full&geometries=geojson"
-
-# Make the request to the OSRM API
-response = requests.get(url)
-# Print out the total distance of the trip_id
-distance =  response.json()['routes'][0]['distance']
-print("total distance of trip = ", distance, "meters")
-if response.status_code == 200:
-    route_data = response.json()
-    # Extract the route geometry (list of coordinates)
-    if route_data.get('routes'):
-        route_geometry = route_data['routes'][0]['geometry']['coordinates']
-        # OSRM gives coordinates in [longitude, latitude], so we need to flip them
-        route = [[lat, lon] for lon, lat in route_geometry]
-    else:
-        route = []
-else:
-    print("Failed to fetch route data from OSRM API.")
+# Route legs and geometry come from a local SQLite cache; only unseen
+# routes are requested from OSRM
+road_distances = CachedDistanceProvider(OSRMProvider(), path="road_distances.sqlite")
+route_lats = [store_latitude] + [cords[0] for cords in shipment_points] + [store_latitude]
+route_lons = [store_longitude] + [cords[1] for cords in shipment_points] + [store_longitude]
+try:
+    route, distance = road_distances.route(route_lats, route_lons)
+    # Print out the total distance of the trip_id
+    print("total distance of trip = ", distance * 1000, "meters")
+except Exception as e:
+    print(f"Failed to fetch route data from OSRM API: {e}")
     route = []  # Fallback to an empty list if the API call fails
 
 # Add the route to the map using PolyLine
@@ -0,0 +1,24 @@
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'algorithm'))
+
+from algo import SmartRouteOptimizer  # noqa: E402
+from bench import generate_scenario  # noqa: E402
+from data import SHIPMENTS_SHEET, STORE_SHEET, VEHICLES_SHEET  # noqa: E402
+
+
+def scenario_optimizer(n_shipments=400, seed=42, **scenario):
+    """Preprocessed optimizer over a seeded synthetic city from bench.generate_scenario."""
+    frames = generate_scenario(n_shipments, seed=seed, **scenario)
+    optimizer = SmartRouteOptimizer(logging_level=logging.WARNING)
+    optimizer.load_records(frames[SHIPMENTS_SHEET], frames[VEHICLES_SHEET], frames[STORE_SHEET])
+    return optimizer.preprocess_data()
+
+
+@pytest.fixture
+def optimizer():
+    return scenario_optimizer()
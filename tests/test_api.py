@@ -0,0 +1,101 @@
+import json
+import os
+
+import pytest
+
+import api
+from bench import generate_scenario
+from data import SHIPMENTS_SHEET, STORE_SHEET, VEHICLES_SHEET
+from model_service import OptimizerService
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def optimizer_service(tmp_path, monkeypatch):
+    """Fresh optimizer service publishing its snapshots under tmp_path."""
+    service = OptimizerService(snapshot_dir=str(tmp_path / 'serving'))
+    monkeypatch.setattr(api, 'optimizer_service', service)
+    yield service
+    service.stop()
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    """Result and run caches under tmp_path instead of the data folder."""
+    monkeypatch.setattr(api, 'result_cache', ResultCache(disk_dir=str(tmp_path / 'results')))
+    monkeypatch.setattr(api, 'trip_runs', ResultCache(disk_dir=str(tmp_path / 'runs'), name='run'))
+
+
+def posted_payload(n_shipments=100, seed=3):
+    frames = generate_scenario(n_shipments, seed=seed)
+    return {name: frame.to_dict(orient='records') for name, frame in
+            [('shipments', frames[SHIPMENTS_SHEET]), ('vehicles', frames[VEHICLES_SHEET]),
+             ('store', frames[STORE_SHEET])]}
+
+
+def test_import_does_not_start_the_service():
+    assert api.optimizer_service._watcher is None
+
+
+def test_service_starts_on_first_prediction(optimizer_service):
+    response = api.app.test_client().post('/api/predict-vehicle', json={
+        'latitude': 19.08, 'longitude': 72.88, 'time_slot': '09:30:00-12:00:00'})
+    assert response.status_code == 200
+    assert optimizer_service._watcher is not None
+    assert os.listdir(optimizer_service.snapshot_dir)
+
+
+def test_stream_rejects_bad_worker_counts():
+    client = api.app.test_client()
+    for workers in (0, -2, '3', 2.5, True):
+        response = client.post('/api/optimize-routes/stream', json={'workers': workers})
+        assert response.status_code == 400
+
+
+def test_worker_count_is_capped_at_cpu_count():
+    assert api._worker_count(10_000) == (os.cpu_count() or 1)
+    assert api._worker_count(None) is None
+    with pytest.raises(ValueError):
+        api._worker_count(0)
+
+
+def test_posted_payload_results_stay_off_disk(tmp_path, monkeypatch, caches):
+    payload = posted_payload()
+    client = api.app.test_client()
+    response = client.post('/api/optimize-routes', json=payload)
+    assert response.status_code == 200
+    run_id = response.get_json()['run_id']
+    assert client.get(f'/api/runs/{run_id}/trips').status_code == 200
+    assert os.listdir(tmp_path / 'results') == [] and os.listdir(tmp_path / 'runs') == []
+
+    monkeypatch.setattr(api, 'PERSIST_POSTED_RESULTS', True)
+    client.post('/api/optimize-routes', json=dict(payload, format='compact'))
+    assert os.listdir(tmp_path / 'results') and os.listdir(tmp_path / 'runs')
+
+
+def test_stream_and_run_pages_answer_if_none_match(caches):
+    payload = posted_payload()
+    client = api.app.test_client()
+    response = client.post('/api/optimize-routes/stream?fields=Trip_ID', json=payload)
+    etag = response.headers['ETag']
+    run_id = json.loads(response.get_data(as_text=True).splitlines()[-1])['run_id']
+
+    repeat = client.post('/api/optimize-routes/stream?fields=Trip_ID', json=payload,
+                         headers={'If-None-Match': etag})
+    assert repeat.status_code == 304 and repeat.get_data() == b''
+    # Other fields are another representation
+    assert client.post('/api/optimize-routes/stream?fields=Trip_ID,Stops', json=payload,
+                       headers={'If-None-Match': etag}).status_code == 200
+
+    page = client.get(f'/api/runs/{run_id}/trips?limit=5')
+    assert page.status_code == 200
+    assert client.get(f'/api/runs/{run_id}/trips?limit=5',
+                      headers={'If-None-Match': page.headers['ETag']}).status_code == 304
+
+
+def test_stream_rejects_bad_region_levels():
+    client = api.app.test_client()
+    for region_level in (-1, 17, '2', 1.5, None):
+        response = client.post('/api/optimize-routes/stream', json={'region_level': region_level})
+        assert response.status_code == 400
+    assert api._region_level(16) == 16
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from data import _read_snapshot, _write_snapshot, load_workbook
+
+
+def test_snapshot_round_trips_mixed_and_typed_columns(tmp_path):
+    frames = {'Vehicles': pd.DataFrame({
+        'Number': pd.Series([50, 25, 'Any', np.nan, 2.5], dtype=object),
+        'Name': pd.Series(['3W', np.nan, '4W', 'x', 'y'], dtype=object),
+        'Label': pd.Series(['a', 'b', 'a', None, 'b'], dtype='string'),
+        'Kind': pd.Series(['a', 'b', 'a', 'a', 'b'], dtype='category'),
+        'Capacity': [5, 8, 25, 1, 2],
+    })}
+    target = tmp_path / 'book.snapshot'
+    _write_snapshot(frames, str(target))
+    restored = _read_snapshot(str(target))['Vehicles']
+
+    pd.testing.assert_frame_equal(restored.copy(), frames['Vehicles'], check_categorical=False)
+    assert [type(value) for value in restored['Number'][:3]] == [int, int, str]
+
+
+def test_snapshot_load_matches_excel_parse():
+    parsed = load_workbook(use_snapshot=False)
+    snapshot = load_workbook()
+    for sheet, frame in parsed.items():
+        pd.testing.assert_frame_equal(snapshot[sheet], frame, check_dtype=False)
+        for column in frame.columns:
+            assert list(map(type, snapshot[sheet][column])) == list(map(type, frame[column])), (sheet, column)
+
+
+def test_new_snapshot_replaces_old_ones(tmp_path):
+    path = tmp_path / 'book.xlsx'
+    other = tmp_path / 'book.xlsx.bak.xlsx'
+    pd.DataFrame({'a': [1, 2]}).to_excel(other, index=False)
+    load_workbook(str(other))
+    for rows in ([1, 2], [1, 2, 3]):
+        pd.DataFrame({'a': rows}).to_excel(path, index=False)
+        load_workbook(str(path))
+
+    snapshots = sorted(entry.name for entry in tmp_path.iterdir() if entry.name.endswith('.snapshot'))
+    # One for each workbook: the .bak workbook's snapshot is not mistaken for an old one
+    assert len(snapshots) == 2
+    assert sum(name.startswith('.book.xlsx.bak.xlsx.') for name in snapshots) == 1
+    assert list(load_workbook(str(path))['Sheet1']['a']) == [1, 2, 3]
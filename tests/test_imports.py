@@ -0,0 +1,12 @@
+from bench import IMPORT_BUDGETS, check_imports, import_cost
+
+
+def test_imports_stay_within_budget():
+    imports, regressions = check_imports()
+    assert set(imports) == set(IMPORT_BUDGETS)
+    assert regressions == [], imports
+
+
+def test_cli_loads_no_lazy_backend():
+    _, loaded = import_cost('smartroute', repeats=1)
+    assert loaded == []
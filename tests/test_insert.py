@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from conftest import scenario_optimizer
+
+
+def test_new_trips_stay_within_fleet_counts():
+    optimizer = scenario_optimizer()
+    optimizer.optimize_trips()
+    fleet = optimizer.vehicles.set_index('vehicle_type')['number'] * optimizer.MAX_TRIPS_PER_VEHICLE
+
+    rng = np.random.default_rng(0)
+    for shipment_id in range(10_000, 10_060):
+        # Scattered late shipments, mostly too far from existing trips to join one
+        lat, lon = 19.075887 + rng.normal(0, 0.08), 72.877911 + rng.normal(0, 0.08)
+        optimizer.insert_shipment(shipment_id, lat, lon, "14:30:00-17:00:00")
+
+    used = optimizer.trips_df['Vehicle_Type'].value_counts()
+    assert (used <= fleet.reindex(used.index)).all()
+
+
+def test_insert_keeps_result_and_index_current():
+    optimizer = scenario_optimizer()
+    optimizer.optimize_trips()
+    rng = np.random.default_rng(1)
+    for shipment_id in range(10_000, 10_030):
+        lat, lon = 19.075887 + rng.normal(0, 0.05), 72.877911 + rng.normal(0, 0.05)
+        optimizer.insert_shipment(shipment_id, lat, lon, rng.choice(["07:00-09:30", "09:30-12:00", "10:00-13:00"]))
+
+    planned = {shipment for shipments in optimizer.trips_df['Shipments'] for shipment in shipments}
+    assert set(optimizer.result.stop_shipment) == planned
+    assert planned & set(range(10_000, 10_030))
+
+    # The incrementally maintained index answers like one rebuilt from scratch
+    lats, lons = 19.075887 + rng.normal(0, 0.05, 50), 72.877911 + rng.normal(0, 0.05, 50)
+    incremental = optimizer._nearest_overlapping_clusters(lats, lons, 9 * 60, 11 * 60, k=3)
+    optimizer._index_clusters()
+    assert (incremental == optimizer._nearest_overlapping_clusters(lats, lons, 9 * 60, 11 * 60, k=3)).all()
+
+
+def test_insert_rejects_duplicate_shipment_id(optimizer):
+    optimizer.optimize_trips()
+    existing = optimizer.processed_shipments['Shipment ID'].iloc[0]
+    with pytest.raises(ValueError):
+        optimizer.insert_shipment(existing, 19.08, 72.88, "09:30-12:00")
+
+
+def test_insert_after_reoptimizing_new_shipments():
+    optimizer = scenario_optimizer()
+    optimizer.optimize_trips()
+    optimizer.insert_shipment(10_000, 19.08, 72.88, "09:30-12:00")
+
+    # A new day's shipments under new IDs replace the old ones
+    shipments = optimizer.shipments.assign(**{'Shipment ID': optimizer.shipments['Shipment ID'] + 50_000})
+    optimizer.load_records(shipments, optimizer.vehicles, optimizer.store.to_frame().T)
+    optimizer.preprocess_data().optimize_trips()
+    optimizer.insert_shipment(10_001, 19.08, 72.88, "09:30-12:00")
+    assert 10_001 in set(optimizer.result.stop_shipment)
+
+    # A clone keeps its own lookups, so the same ID can go into both
+    clone = optimizer._clone()
+    clone.optimize_trips()
+    clone.insert_shipment(10_002, 19.08, 72.88, "09:30-12:00")
+    optimizer.insert_shipment(10_002, 19.08, 72.88, "09:30-12:00")
@@ -0,0 +1,21 @@
+from conftest import scenario_optimizer
+
+
+def test_partitions_stay_within_fleet_counts():
+    for engine in ('cluster', 'savings'):
+        optimizer = scenario_optimizer(1_000)
+        fleet = optimizer.vehicles.set_index('vehicle_type')['number']
+        result = optimizer.optimize_trips(engine=engine, partition_by='timeslot', workers=1)
+
+        used = result.trips['Vehicle_Type'].value_counts()
+        for vehicle_type, count in used.items():
+            assert count <= fleet[vehicle_type] * optimizer.MAX_TRIPS_PER_VEHICLE, (engine, vehicle_type)
+
+
+def test_partitions_share_out_a_fixed_cluster_count():
+    optimizer = scenario_optimizer(1_000)
+    optimizer.N_CLUSTERS = 40
+    optimizer.MAX_TRIPS_PER_VEHICLE = float('inf')
+    optimizer.optimize_trips(partition_by='timeslot', workers=1)
+
+    assert optimizer.processed_shipments['Cluster'].nunique() == 40
@@ -0,0 +1,32 @@
+import logging
+
+import numpy as np
+
+from algo import SmartRouteOptimizer
+from conftest import scenario_optimizer
+from partition import KM_PER_DEGREE, capacity_partition
+
+
+def test_groups_are_compact_and_within_capacity():
+    optimizer = scenario_optimizer(5_000)
+    lats = optimizer.processed_shipments['Latitude'].to_numpy()
+    lons = optimizer.processed_shipments['Longitude'].to_numpy()
+    labels = capacity_partition(lats, lons, capacity=5, max_radius_km=1.5)
+
+    assert len(labels) == len(lats)
+    assert np.bincount(labels).max() <= 5
+    x = lons * KM_PER_DEGREE * np.cos(np.radians(lats.mean()))
+    y = lats * KM_PER_DEGREE
+    for group in np.unique(labels):
+        members = labels == group
+        assert np.hypot(np.ptp(x[members]), np.ptp(y[members])) <= 3.0 + 1e-9
+
+
+def test_grid_assigns_at_least_as_many_shipments_as_kmeans():
+    for max_trips in (1, np.inf):
+        assigned = {}
+        for method in ('kmeans', 'grid'):
+            optimizer = SmartRouteOptimizer(logging_level=logging.WARNING).load_data().preprocess_data()
+            optimizer.MAX_TRIPS_PER_VEHICLE = max_trips
+            assigned[method] = int(optimizer.optimize_trips(method=method).trips['Stops'].sum())
+        assert assigned['grid'] >= assigned['kmeans'], (max_trips, assigned)
@@ -0,0 +1,40 @@
+import numpy as np
+
+from road_distance import CachedDistanceProvider, HaversineProvider, OSRMProvider
+
+LATS, LONS = np.array([19.07, 19.08, 19.10]), np.array([72.87, 72.88, 72.90])
+
+
+def fake_osrm(monkeypatch):
+    """OSRM client answering every table/route request with 7 km legs."""
+    def get(service, lats, lons, params):
+        if service == 'route':
+            return {'routes': [{'geometry': {'coordinates': [[lon, lat] for lat, lon in zip(lats, lons)]},
+                                'distance': 7000.0}]}
+        n_src, n_dst = len(params['sources'].split(';')), len(params['destinations'].split(';'))
+        return {'distances': np.full((n_src, n_dst), 7000.0).tolist(),
+                'durations': np.full((n_src, n_dst), 600.0).tolist()}
+
+    provider = OSRMProvider('http://osrm.test')
+    monkeypatch.setattr(provider, '_get', get)
+    return provider
+
+
+def test_providers_sharing_a_cache_file_keep_their_own_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / 'road_distances.sqlite')
+    stand_in = CachedDistanceProvider(HaversineProvider(), path)
+    osrm = CachedDistanceProvider(fake_osrm(monkeypatch), path)
+
+    expected, _ = HaversineProvider().matrix(LATS, LONS, LATS, LONS)
+    assert np.allclose(stand_in.matrix(LATS, LONS, LATS, LONS)[0], expected)
+    stand_in_route = stand_in.route(LATS, LONS)[1]
+
+    # OSRM misses on the legs and route the stand-in already cached
+    distance, _ = osrm.matrix(LATS, LONS, LATS, LONS)
+    assert np.allclose(distance, 7.0) and osrm.hits == 0
+    assert osrm.route(LATS, LONS)[1] == 7.0 and osrm.hits == 0
+
+    # ...and each provider then hits its own rows
+    assert np.allclose(stand_in.matrix(LATS, LONS, LATS, LONS)[0], expected)
+    assert stand_in.route(LATS, LONS)[1] == stand_in_route
+    assert np.allclose(osrm.matrix(LATS, LONS, LATS, LONS)[0], 7.0) and osrm.hits == 9
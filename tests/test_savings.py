@@ -0,0 +1,19 @@
+import numpy as np
+
+from road_distance import HaversineProvider
+from routing import route_matrix, tour_length
+
+
+def test_savings_measures_tours_with_road_provider(optimizer):
+    provider = HaversineProvider(detour_factor=2.0)
+    optimizer.distance_provider = provider
+    optimizer.optimize_trips(engine='savings')
+    trips = optimizer.trips_df
+    shipments = optimizer.processed_shipments.set_index('Shipment ID')
+
+    store = optimizer.store['Latitute'], optimizer.store['Longitude']
+    for trip in trips.head(20).itertuples():
+        stops = shipments.loc[trip.Shipments]
+        road = route_matrix(*store, stops['Latitude'], stops['Longitude'], provider)
+        assert np.isclose(trip.Total_Distance, tour_length(np.arange(len(stops) + 1), road), atol=0.01)
+
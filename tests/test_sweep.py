@@ -0,0 +1,15 @@
+import pytest
+
+from sweep import parameter_grid
+
+
+def test_delivery_time_changes_cluster_sweep(optimizer):
+    table = optimizer.sweep_parameters(parameter_grid(DELIVERY_TIME_PER_SHIPMENT=[0, 20]), workers=1)
+    outputs = table[['vehicles', 'shipments_assigned', 'total_km']]
+    assert not outputs.iloc[0].equals(outputs.iloc[1])
+    assert table.loc[1, 'shipments_assigned'] < table.loc[0, 'shipments_assigned']
+
+
+def test_sweep_rejects_parameters_the_engine_ignores(optimizer):
+    with pytest.raises(ValueError):
+        optimizer.sweep_parameters(parameter_grid(N_CLUSTERS=[50, 80]), engine='savings', workers=1)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from timeslots import IntervalIndex, parse_timeslot, parse_timeslots, slots_overlap
+
+
+def test_back_to_back_slots_do_not_overlap():
+    start, end = parse_timeslot("07:00-09:00")
+    window_start, window_end = parse_timeslot("09:00-12:00")
+    assert not slots_overlap(start, end, window_start, window_end)
+    assert slots_overlap(start, end + 1, window_start, window_end)
+
+    index = IntervalIndex([window_start], [window_end])
+    assert len(index.overlapping(start, end)) == 0
+    assert list(index.overlapping(start, end + 1)) == [0]
+
+
+def test_interval_index_matches_brute_force():
+    rng = np.random.default_rng(7)
+    starts = rng.integers(0, 24 * 60, 300) // 30 * 30
+    ends = starts + rng.integers(0, 8, 300) * 30
+    index = IntervalIndex(starts, ends)
+    for query_start in range(0, 24 * 60, 45):
+        for length in (0, 30, 150):
+            expected = np.flatnonzero(slots_overlap(starts, ends, query_start, query_start + length))
+            assert list(index.overlapping(query_start, query_start + length)) == list(expected)
+
+
+def test_every_node_holds_a_window():
+    starts, ends = parse_timeslots(["07:00-08:00", "09:00-10:00", "11:00-12:00", "13:00-14:00"])
+    index = IntervalIndex(starts, ends)
+    assert all(len(node[1]) for node in index._nodes)
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from conftest import scenario_optimizer
+
+
+def test_cluster_trips_fit_time_limit_with_delivery_stops():
+    for method in ('kmeans', 'grid'):
+        optimizer = scenario_optimizer()
+        trips = optimizer.optimize_trips(method=method).trips
+        minutes = (trips['Total_Distance'] * optimizer.TRAVEL_TIME_PER_KM +
+                   trips['Stops'] * optimizer.DELIVERY_TIME_PER_SHIPMENT)
+        assert (minutes <= optimizer.TRIP_TIME_LIMIT + 0.05).all(), method
+
+
+def test_reported_trip_time_includes_delivery_stops():
+    for engine in ('cluster', 'savings'):
+        optimizer = scenario_optimizer()
+        result = optimizer.optimize_trips(engine=engine)
+        trips = result.trips
+        minutes = (trips['Total_Distance'] * optimizer.TRAVEL_TIME_PER_KM +
+                   trips['Stops'] * optimizer.DELIVERY_TIME_PER_SHIPMENT)
+        assert (abs(trips['Trip_Time'] - minutes) < 0.05).all(), engine
+        assert (result.to_flat()['TRIP_TIME'] >= optimizer.DELIVERY_TIME_PER_SHIPMENT).all()
+
+
+def test_streamed_chunks_emit_their_own_trips_within_the_fleet(tmp_path):
+    optimizer = scenario_optimizer()
+    path = tmp_path / 'shipments.csv'
+    optimizer.shipments.to_csv(path, index=False)
+
+    results = list(optimizer.iter_trips_streaming(str(path), chunksize=150))
+    assert len(results) == 3
+    ids = optimizer.shipments['Shipment ID'].to_numpy()
+    for chunk, result in enumerate(results):
+        assert set(result.stop_shipment) <= set(ids[chunk * 150:(chunk + 1) * 150])
+    # Trips never reuse an ID and together stay within Number x MAX_TRIPS_PER_VEHICLE
+    trip_ids = [trip_id for result in results for trip_id in result.trips['Trip_ID']]
+    assert len(trip_ids) == len(set(trip_ids))
+    used = pd.concat([result.trips['Vehicle_Type'] for result in results]).value_counts()
+    limits = optimizer.vehicles.set_index('vehicle_type')['number'] * optimizer.MAX_TRIPS_PER_VEHICLE
+    assert (used <= limits.reindex(used.index)).all()
+    # Only the last chunk is held
+    assert len(optimizer.processed_shipments) == 100